@@ -0,0 +1,226 @@
+# Micro-benchmarks for the per-request CPU work on hot paths.
+#
+#   poetry run python performance-tests/bench_hot_paths.py --save
+#   poetry run python performance-tests/bench_hot_paths.py --compare
+#
+# --save writes the results to the baseline file, --compare exits non-zero
+# when any case is slower than the baseline by more than --threshold.
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import platform
+import sys
+import timeit
+import warnings
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("SQLDB_URL", "sqlite+aiosqlite://")
+warnings.simplefilter("ignore", DeprecationWarning)
+
+import jwt
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from snoutsaver import models, security, config, responses
+
+BASELINE = ROOT / "performance-tests" / "baselines" / "hot_paths.json"
+
+settings = config.get_settings()
+
+
+class Row:
+    # stands in for a SQLAlchemy Row, models_from_rows() only reads _mapping
+    def __init__(self, mapping: dict):
+        self._mapping = mapping
+
+
+def make_records(size: int) -> list[models.DBRecord]:
+    record_date = datetime.datetime(2024, 1, 1)
+    return [
+        models.DBRecord(
+            id=index,
+            user_id=1,
+            description=f"Record {index}",
+            amount=100.0 + index,
+            currency="THB",
+            type="Expense",
+            category_id=6,
+            category_name="Food & Drinks",
+            pocket_id=1,
+            record_date=record_date + datetime.timedelta(hours=index),
+            is_monthly=True,
+            setup_id=1,
+        )
+        for index in range(size)
+    ]
+
+
+def case_create_access_token():
+    data = {"sub": 1}
+    return lambda: security.create_access_token(data=data)
+
+
+def case_decode_token():
+    token = security.create_access_token(data={"sub": 1})
+    return lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+
+
+def case_record_list(size: int):
+    records = make_records(size)
+    return lambda: models.RecordList.model_validate(dict(records=records))
+
+
+def case_record_list_projected(size: int):
+    # rows as the list endpoint selects them with responses.columns_for()
+    columns = [column.key for column in responses.columns_for(models.Records, models.DBRecord)]
+    rows = [
+        Row({column: getattr(record, column) for column in columns})
+        for record in make_records(size)
+    ]
+    return lambda: models.RecordList.model_construct(
+        records=responses.models_from_rows(models.Records, rows)
+    )
+
+
+def make_users(size: int) -> list[models.DBUser]:
+    return [
+        models.DBUser(
+            id=index,
+            email=f"user{index}@email.local",
+            username=f"user{index}",
+            first_name="Firstname",
+            last_name="Lastname",
+            provider="default",
+        )
+        for index in range(size)
+    ]
+
+
+def case_response(model: str, size: int, fast: bool):
+    # FastAPI validates the returned model against the response model, dumps
+    # it to JSON-compatible Python objects and then runs json.dumps; the fast
+    # path hands the model straight to pydantic-core
+    if model == "RecordList":
+        content = models.RecordList.model_validate(dict(records=make_records(size)))
+    else:
+        content = models.UserList.model_validate(
+            dict(items=make_users(size), page=1, page_size=1, size_per_page=size, total=size)
+        )
+
+    if fast:
+        return lambda: responses.PydanticJSONResponse(content).body
+
+    adapter = TypeAdapter(type(content))
+    return lambda: JSONResponse(
+        adapter.dump_python(adapter.validate_python(content), mode="json")
+    ).body
+
+
+def case_setup_reshape(size: int):
+    # mirrors the response building at the end of routers/setups.py
+    db_setup = models.DBSetup(id=1, user_id=1, monthly_income=30000, saving_goal=5000, year=2024)
+    expenses = make_records(size)
+
+    def run():
+        monthly_expenses = [
+            expense.dict() for expense in expenses if expense.type == "Expense"
+        ]
+        return models.Setups.model_validate(
+            {**db_setup.dict(), "monthly_expenses": monthly_expenses}
+        )
+
+    return run
+
+
+CASES = {
+    "security.create_access_token": case_create_access_token,
+    "deps.jwt_decode": case_decode_token,
+    **{
+        f"RecordList.model_validate[{size}]": (lambda size=size: case_record_list(size))
+        for size in (10, 100, 1000)
+    },
+    **{
+        f"RecordList.projected[{size}]": (lambda size=size: case_record_list_projected(size))
+        for size in (10, 100, 1000)
+    },
+    **{
+        f"{model}.{path}_response[{size}]": (
+            lambda model=model, size=size, path=path: case_response(model, size, path == "fast")
+        )
+        for model in ("RecordList", "UserList")
+        for size in (100, 1000)
+        for path in ("fastapi", "fast")
+    },
+    **{
+        f"setups.reshape[{size}]": (lambda size=size: case_setup_reshape(size))
+        for size in (5, 20, 100)
+    },
+}
+
+
+def measure(func, repeat: int) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # best of several runs is the least noisy estimate of the real cost
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("cases", nargs="*", help="only run cases containing these names")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())["results"]
+
+    results = {}
+    regressions = []
+    for name, build in CASES.items():
+        if args.cases and not any(case in name for case in args.cases):
+            continue
+
+        seconds = measure(build(), args.repeat)
+        results[name] = seconds
+
+        line = f"{name:<36}{seconds * 1e6:>12.2f} us"
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            line += f"{change:>+10.1%}"
+            if change > args.threshold:
+                line += "  SLOWER"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(
+            json.dumps(
+                dict(
+                    python=platform.python_version(),
+                    machine=platform.machine(),
+                    created=datetime.datetime.now().isoformat(),
+                    results=results,
+                ),
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"saved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
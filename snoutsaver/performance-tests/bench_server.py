@@ -0,0 +1,120 @@
+# Compare throughput and latency of the API with and without gevent
+# monkey-patching.
+#
+#   SQLDB_URL=... poetry run python performance-tests/bench_server.py
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(base_url: str, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started_at = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code >= 400:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return dict(
+        path=path,
+        requests=len(latencies),
+        errors=errors,
+        rps=len(latencies) / elapsed,
+        p50_ms=quantiles[49] * 1000,
+        p95_ms=quantiles[94] * 1000,
+        p99_ms=quantiles[98] * 1000,
+    )
+
+
+async def bench(monkey_patch: bool, args) -> list[dict] | None:
+    env = dict(
+        os.environ,
+        GEVENT_MONKEY_PATCH=str(monkey_patch).lower(),
+        SERVER_PORT=str(args.port),
+        SERVER_WORKERS=str(args.workers),
+        SERVER_ACCESS_LOG="false",
+    )
+    server = subprocess.Popen([sys.executable, "-m", "snoutsaver.server"], env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        try:
+            await wait_ready(base_url, args.startup_timeout)
+        except RuntimeError:
+            return None
+
+        await run_load(base_url, "/", 50, args.concurrency)  # warm up
+        return [
+            await run_load(base_url, path, args.requests, args.concurrency)
+            for path in args.paths
+        ]
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--paths", nargs="+", default=["/", "/users/?size_per_page=10"])
+    args = parser.parse_args()
+
+    print(f"{'monkey_patch':<14}{'path':<28}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for monkey_patch in (False, True):
+        results = await bench(monkey_patch, args)
+        if results is None:
+            print(f"{str(monkey_patch):<14}server did not finish startup")
+            continue
+
+        for result in results:
+            print(
+                f"{str(monkey_patch):<14}{result['path']:<28}{result['rps']:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,4 @@
+# The test_*.py files here are locust files, not pytest tests. Importing
+# locust monkey-patches the whole process with gevent, which breaks the
+# async test suite, so pytest must never collect them.
+collect_ignore_glob = ["test_*.py"]
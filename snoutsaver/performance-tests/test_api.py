@@ -0,0 +1,203 @@
+from locust import HttpUser, task, between, events
+import datetime
+import random
+import uuid
+
+
+# Templated names keep one stats row per endpoint instead of one per id
+RECORD = "/records/{record_id}"
+POCKETS = "/pockets/{user_id}"
+CATEGORY = "/categories/{category_id}"
+
+
+class ApiUser(HttpUser):
+    wait_time = between(1, 5)
+    host = "http://localhost:8000"
+
+    def on_start(self):
+        self.record_ids = []
+        self.pocket_ids = []
+        self.expense_category_ids = []
+
+        name = f"load-{uuid.uuid4().hex[:12]}"
+        password = "password1234"
+        self.client.post(
+            "/users/create",
+            json=dict(
+                email=f"{name}@email.local",
+                username=name,
+                password=password,
+                confirm_password=password,
+                provider="default",
+            ),
+        )
+
+        token = self.client.post(
+            "/token", data=dict(username=name, password=password)
+        ).json()
+        self.client.headers["Authorization"] = f"Bearer {token['access_token']}"
+
+        self.user_id = self.client.get("/users/me").json()["id"]
+
+        categories = self.client.get(
+            "/categories", params=dict(size_per_page=100), name="/categories"
+        ).json()["items"]
+        self.expense_category_ids = [
+            category["id"] for category in categories if category["type"] == "Expense"
+        ]
+
+        for pocket_name, balance in (("Wallet", 5000), ("Savings", 20000)):
+            self.client.post("/pockets", json=dict(name=pocket_name, balance=balance))
+        self.load_pockets()
+
+        self.client.post(
+            "/setups",
+            json=dict(
+                monthly_income=30000,
+                saving_goal=5000,
+                year=datetime.date.today().year,
+                monthly_expenses=[
+                    dict(category_id=category_id, amount=random.randint(500, 3000))
+                    for category_id in self.expense_category_ids[:3]
+                ],
+            ),
+        )
+
+        for _ in range(5):
+            self.create_record()
+
+    def load_pockets(self):
+        response = self.client.get(f"/pockets/{self.user_id}", name=POCKETS)
+        self.pocket_ids = [pocket["id"] for pocket in response.json()["items"]]
+
+    def record_payload(self) -> dict:
+        category_id = random.choice(self.expense_category_ids)
+        return dict(
+            user_id=self.user_id,
+            description="Load test expense",
+            amount=round(random.uniform(20, 2000), 2),
+            currency="THB",
+            type="Expense",
+            category_id=category_id,
+            category_name="",
+            pocket_id=random.choice(self.pocket_ids) if self.pocket_ids else None,
+            record_date=(
+                datetime.datetime.now() - datetime.timedelta(days=random.randint(0, 365))
+            ).isoformat(),
+        )
+
+    # [Record]------------------------------------------------------------
+
+    @task(6)
+    def list_records(self):
+        self.client.get("/records", params=dict(limit=50), name="/records")
+
+    @task(4)
+    def create_record(self):
+        response = self.client.post("/records", json=self.record_payload())
+        if response.status_code == 200:
+            self.record_ids.append(response.json()["id"])
+
+    @task(3)
+    def read_record(self):
+        if self.record_ids:
+            self.client.get(f"/records/{random.choice(self.record_ids)}", name=RECORD)
+
+    @task(1)
+    def update_record(self):
+        if self.record_ids:
+            self.client.put(
+                f"/records/{random.choice(self.record_ids)}",
+                json=self.record_payload(),
+                name=RECORD,
+            )
+
+    @task(1)
+    def delete_record(self):
+        if len(self.record_ids) > 5:
+            record_id = self.record_ids.pop(0)
+            self.client.delete(f"/records/{record_id}", name=RECORD)
+
+    @task(2)
+    def records_summary(self):
+        self.client.get("/records/summary")
+
+    # [Setup]------------------------------------------------------------
+
+    @task(2)
+    def read_setup(self):
+        self.client.get("/setups")
+
+    @task(1)
+    def update_setup(self):
+        setup = self.client.get("/setups").json()
+        expenses = setup.get("monthly_expenses") or []
+        self.client.put(
+            "/setups",
+            json=dict(
+                monthly_income=random.randint(25000, 40000),
+                monthly_expenses=[
+                    dict(
+                        id=expense["id"],
+                        category_id=expense["category_id"],
+                        amount=random.randint(500, 3000),
+                    )
+                    for expense in expenses
+                ],
+            ),
+        )
+
+    # [Pocket]------------------------------------------------------------
+
+    @task(2)
+    def list_pockets(self):
+        self.load_pockets()
+
+    @task(1)
+    def transfer(self):
+        if len(self.pocket_ids) >= 2:
+            from_pocket_id, to_pocket_id = random.sample(self.pocket_ids, 2)
+            with self.client.post(
+                "/pockets/transfer",
+                json=dict(
+                    from_pocket_id=from_pocket_id,
+                    to_pocket_id=to_pocket_id,
+                    amount=round(random.uniform(1, 50), 2),
+                ),
+                catch_response=True,
+            ) as response:
+                # running a pocket dry is an expected outcome, not a failure
+                if response.status_code == 400:
+                    response.success()
+
+    # [Category]------------------------------------------------------------
+
+    @task(3)
+    def list_categories(self):
+        self.client.get("/categories")
+
+    @task(1)
+    def read_category(self):
+        if self.expense_category_ids:
+            self.client.get(
+                f"/categories/{random.choice(self.expense_category_ids)}", name=CATEGORY
+            )
+
+    # [User]------------------------------------------------------------
+
+    @task(2)
+    def read_me(self):
+        self.client.get("/users/me")
+
+
+@events.quitting.add_listener
+def print_percentiles(environment, **kwargs):
+    stats = environment.stats
+    print(f"\n{'Method':<8}{'Name':<32}{'Reqs':>8}{'Fails':>7}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for entry in sorted(stats.entries.values(), key=lambda entry: entry.name):
+        print(
+            f"{entry.method:<8}{entry.name:<32}{entry.num_requests:>8}{entry.num_failures:>7}"
+            f"{entry.get_response_time_percentile(0.5):>8.0f}"
+            f"{entry.get_response_time_percentile(0.95):>8.0f}"
+            f"{entry.get_response_time_percentile(0.99):>8.0f}"
+        )
@@ -0,0 +1,14 @@
+import asyncio
+from snoutsaver.snoutsaver import config, models, ledger
+
+
+async def main(grace_seconds: int):
+    async for session in models.get_session():
+        snapshots = await ledger.compact(session, grace_seconds)
+        print("snapshots written", snapshots)
+
+
+if __name__ == "__main__":
+    settings = config.get_settings()
+    models.init_db(settings)
+    asyncio.run(main(settings.LEDGER_COMPACT_GRACE_SECONDS))
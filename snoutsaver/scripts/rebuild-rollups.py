@@ -0,0 +1,13 @@
+import asyncio
+from snoutsaver.snoutsaver import config, models, rollups
+
+
+async def main():
+    async for session in models.get_session():
+        await rollups.rebuild(session)
+
+
+if __name__ == "__main__":
+    settings = config.get_settings()
+    models.init_db(settings)
+    asyncio.run(main())
@@ -0,0 +1 @@
+poetry run locust -f performance-tests/test_api.py --csv performance-tests/results/api
\ No newline at end of file
@@ -0,0 +1 @@
+poetry run snoutsaver-server
\ No newline at end of file
@@ -0,0 +1,93 @@
+import contextlib
+import hashlib
+import json
+
+from sqlalchemy import func
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import SQLModel, select
+
+from . import models
+from . import rollups
+from . import seed_data
+
+
+SCHEMA_KEY = "schema"
+# advisory lock key shared by every worker bootstrapping the same database
+BOOTSTRAP_LOCK = 0x536E6F75
+# set once record_rollups has been filled from the existing records
+ROLLUPS_KEY = "rollups"
+
+
+def schema_version() -> str:
+    # Changes whenever a table, column, index or default category changes
+    digest = hashlib.sha256()
+    for table in sorted(SQLModel.metadata.sorted_tables, key=lambda table: table.name):
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f"{column.name}:{column.type}:{column.nullable}".encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(index.name.encode())
+    digest.update(json.dumps(seed_data.DEFAULT_CATEGORIES, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+async def read_version() -> str | None:
+    async with models.engine.connect() as conn:
+        try:
+            result = await conn.execute(
+                select(models.DBBootstrapState.version).where(
+                    models.DBBootstrapState.key == SCHEMA_KEY
+                )
+            )
+        except DBAPIError:
+            # first boot, the marker table does not exist yet
+            return None
+        return result.scalar_one_or_none()
+
+
+@contextlib.asynccontextmanager
+async def bootstrap_lock():
+    # Workers starting together would otherwise all create tables and seed
+    # categories at once. SQLite allows a single writer and needs no lock.
+    if models.engine.dialect.name != "postgresql":
+        yield
+        return
+
+    async with models.engine.connect() as conn:
+        await conn.execute(select(func.pg_advisory_lock(BOOTSTRAP_LOCK)))
+        try:
+            yield
+        finally:
+            await conn.execute(select(func.pg_advisory_unlock(BOOTSTRAP_LOCK)))
+
+
+async def bootstrap() -> bool:
+    # One query on a database that is already up to date; the schema and
+    # seed data are only checked when the version marker is missing or old.
+    version = schema_version()
+    if await read_version() == version:
+        return False
+
+    async with bootstrap_lock():
+        # another worker may have finished while this one waited
+        if await read_version() == version:
+            return False
+        await run_bootstrap(version)
+    return True
+
+
+async def run_bootstrap(version: str):
+    await models.create_all()
+    async for session in models.get_session():
+        await seed_data.seed_default_categories(session)
+
+        # record_rollups is created empty next to records that may already
+        # exist; the summary endpoint reads it, so fill it before serving
+        if await session.get(models.DBBootstrapState, ROLLUPS_KEY) is None:
+            await rollups.rebuild(session)
+            session.add(models.DBBootstrapState(key=ROLLUPS_KEY, version="1"))
+            print("record rollups rebuilt from records")
+
+        await session.merge(models.DBBootstrapState(key=SCHEMA_KEY, version=version))
+        await session.commit()
+
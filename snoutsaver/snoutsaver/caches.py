@@ -0,0 +1,234 @@
+import time
+
+from collections import OrderedDict
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+from . import config
+from . import etags
+
+
+settings = config.get_settings()
+
+
+class TTLCache:
+    # Small LRU cache where every entry also expires after a TTL.
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return dict(
+            size=len(self._data),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
+
+
+class CategoryCache:
+    # Categories are global and almost never change, so keep a copy of the
+    # whole table in memory, reloading it in one query once the TTL expires.
+    # Ids/names missing from a fresh copy fall back to the database and are
+    # added to the cache, writes go through put() / remove().
+    def __init__(self, ttl: int = 0):
+        self.ttl = ttl
+        self._by_id: dict[int, models.Category] = {}
+        self._loaded_at: float | None = None
+        self._etag: str | None = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def loaded(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        return not self.ttl or time.monotonic() - self._loaded_at < self.ttl
+
+    async def load(self, session: AsyncSession) -> list[models.Category]:
+        result = await session.exec(select(models.DBCategory))
+        self._by_id = {
+            category.id: models.Category.model_validate(category)
+            for category in result.all()
+        }
+        self._loaded_at = time.monotonic()
+        self._etag = None
+        return self.items()
+
+    def items(self) -> list[models.Category]:
+        return sorted(self._by_id.values(), key=lambda category: category.id)
+
+    def etag(self) -> str:
+        # digest of the cached categories, recomputed after every change
+        if self._etag is None:
+            self._etag = etags.make_etag(
+                [category.model_dump() for category in self.items()]
+            )
+        return self._etag
+
+    async def all(self, session: AsyncSession) -> list[models.Category]:
+        if self.loaded:
+            self.hits += 1
+            return self.items()
+
+        self.misses += 1
+        return await self.load(session)
+
+    async def get(
+        self, session: AsyncSession, category_id: int
+    ) -> models.Category | None:
+        if not self.loaded:
+            self.misses += 1
+            await self.load(session)
+            return self._by_id.get(category_id)
+
+        category = self._by_id.get(category_id)
+        if category:
+            self.hits += 1
+            return category
+
+        self.misses += 1
+        db_category = await session.get(models.DBCategory, category_id)
+        if not db_category:
+            return None
+
+        return self.put(db_category)
+
+    async def get_many(
+        self, session: AsyncSession, category_ids
+    ) -> dict[int, models.Category]:
+        category_ids = set(category_ids)
+
+        if not self.loaded:
+            self.misses += 1
+            await self.load(session)
+            return {i: self._by_id[i] for i in category_ids if i in self._by_id}
+
+        found = {i: self._by_id[i] for i in category_ids if i in self._by_id}
+        self.hits += len(found)
+
+        missing = category_ids - found.keys()
+        if missing:
+            self.misses += len(missing)
+            result = await session.exec(
+                select(models.DBCategory).where(models.DBCategory.id.in_(missing))
+            )
+            for db_category in result.all():
+                found[db_category.id] = self.put(db_category)
+
+        return found
+
+    async def get_by_name(
+        self, session: AsyncSession, name: str, type: str | None = None
+    ) -> models.Category | None:
+        reloaded = False
+        if not self.loaded:
+            self.misses += 1
+            await self.load(session)
+            reloaded = True
+
+        for category in self.items():
+            if category.name == name and (type is None or category.type == type):
+                if not reloaded:
+                    self.hits += 1
+                return category
+
+        if reloaded:
+            return None
+
+        self.misses += 1
+        statement = select(models.DBCategory).where(models.DBCategory.name == name)
+        if type is not None:
+            statement = statement.where(models.DBCategory.type == type)
+
+        result = await session.exec(statement.order_by(models.DBCategory.id))
+        db_category = result.first()
+        if not db_category:
+            return None
+
+        return self.put(db_category)
+
+    def put(self, category) -> models.Category:
+        category = models.Category.model_validate(category)
+        self._by_id[category.id] = category
+        self._etag = None
+        return category
+
+    def remove(self, category_id: int):
+        self._by_id.pop(category_id, None)
+        self._etag = None
+
+    def clear(self):
+        self._by_id = {}
+        self._loaded_at = None
+        self._etag = None
+
+    def stats(self) -> dict:
+        return dict(
+            size=len(self._by_id),
+            loaded=self.loaded,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+category_cache = CategoryCache(ttl=settings.CATEGORY_CACHE_TTL_SECONDS)
+
+
+# Decoded JWT claims keyed by the raw token, and user snapshots keyed by id,
+# so authenticated requests do not need the database just to authenticate.
+token_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+user_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+
+def put_user(user) -> models.CurrentUser:
+    snapshot = models.CurrentUser.model_validate(user)
+    user_cache.set(snapshot.id, snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: int):
+    user_cache.pop(user_id)
@@ -9,6 +9,46 @@ class Settings(BaseSettings):
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 7 * 24 * 60 # 7 days
     # test
     # REFRESH_TOKEN_EXPIRE_MINUTES: int = 1 # 1 minute
+    REFRESH_TOKEN_ROTATION: bool = False # /token/refresh issues a new refresh token and revokes the old one
+
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_LOOP: str = "auto" # auto, uvloop or asyncio
+    SERVER_HTTP: str = "auto" # auto, httptools or h11
+    SERVER_KEEPALIVE: int = 5 # seconds
+    SERVER_BACKLOG: int = 2048
+    SERVER_ACCESS_LOG: bool = True
+    GEVENT_MONKEY_PATCH: bool = False
+
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30 # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 30 * 60 # seconds, -1 = never
+    DB_POOL_PRE_PING: bool = False
+    DB_QUERY_HEADERS: bool = False # debug only, X-DB-Query-Count/-Time-ms headers
+    DB_QUERY_REPEAT_WARNING: int = 5 # print statements repeated this often per request
+
+    CATEGORY_CACHE_TTL_SECONDS: int = 5 * 60 # 0 = never expire
+    CATEGORY_CACHE_CONTROL: str = "private, max-age=300"
+    AUTH_CACHE_TTL_SECONDS: int = 60 # 0 = disabled
+    AUTH_CACHE_MAX_SIZE: int = 10000
+
+    PASSWORD_HASH_EXECUTOR: str = "thread" # thread or process
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4
+
+    LEDGER_COMPACT_INTERVAL_SECONDS: int = 5 * 60 # 0 = disabled, single worker only
+    LEDGER_COMPACT_GRACE_SECONDS: int = 60 # entries younger than this stay in the tail
+
+    FAST_JSON_RESPONSE: bool = True # serialize responses with pydantic-core
+
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024 # bytes, smaller bodies are sent as they are
+    COMPRESSION_GZIP_LEVEL: int = 6 # 1-9
+    COMPRESSION_BROTLI_QUALITY: int = 4 # 0-11, needs the brotli extra
+    PAGINATION_ESTIMATE_THRESHOLD: int = 100000 # use the planner estimate above this
 
     model_config = SettingsConfigDict(
         env_file=".env", validate_assignment=True, extra="allow"
@@ -2,6 +2,7 @@ from fastapi import Depends, HTTPException, logger, status, Path, Query
 from fastapi.security import OAuth2PasswordBearer
 
 import typing
+import time
 import jwt
 
 from pydantic import ValidationError
@@ -9,6 +10,7 @@ from pydantic import ValidationError
 from . import models
 from . import security
 from . import config
+from . import caches
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
@@ -19,27 +21,41 @@ settings = config.get_settings()
 async def get_current_user(
     token: typing.Annotated[str, Depends(oauth2_scheme)],
     session: typing.Annotated[models.AsyncSession, Depends(models.get_session)],
-) -> models.User:
+) -> models.CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        user_id: int = payload.get("sub")
 
-        if user_id is None:
+    payload = caches.token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+            )
+        except jwt.PyJWTError as e:
+            print(e)
             raise credentials_exception
 
-    except jwt.PyJWTError as e:
-        print(e)
+        # never keep the claims around longer than the token itself is valid
+        expires_in = payload.get("exp", 0) - time.time()
+        caches.token_cache.set(token, payload, ttl=expires_in)
+
+    # tokens issued before the type claim existed are access tokens
+    if payload.get("type", security.ACCESS_TOKEN) != security.ACCESS_TOKEN:
         raise credentials_exception
 
-    user = await session.get(models.DBUser, user_id)
-    if user is None:
+    user_id: int = payload.get("sub")
+    if user_id is None:
         raise credentials_exception
 
-    return user
\ No newline at end of file
+    user = caches.user_cache.get(user_id)
+    if user is None:
+        db_user = await session.get(models.DBUser, user_id)
+        if db_user is None:
+            raise credentials_exception
+
+        user = caches.put_user(db_user)
+
+    return user
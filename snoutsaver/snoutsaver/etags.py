@@ -0,0 +1,70 @@
+import hashlib
+import json
+
+from fastapi import Response
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+# resource_versions keys, bumped by every write to the resource
+SETUPS_RESOURCE = "setups"
+
+# suffixes servers append to an ETag when they compress the body
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _normalize(etag: str) -> str:
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    etag = etag.strip('"')
+    for suffix in ENCODING_SUFFIXES:
+        if etag.endswith(suffix):
+            etag = etag[: -len(suffix)]
+    return etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _normalize(etag) in {_normalize(tag) for tag in if_none_match.split(",")}
+
+
+def not_modified(etag: str, headers: dict | None = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
+
+
+async def get_version(session: AsyncSession, user_id: int, resource: str) -> int:
+    result = await session.exec(
+        select(models.DBResourceVersion.version).where(
+            models.DBResourceVersion.user_id == user_id,
+            models.DBResourceVersion.resource == resource,
+        )
+    )
+    return result.one_or_none() or 0
+
+
+async def bump_version(session: AsyncSession, user_id: int, resource: str):
+    table = models.DBResourceVersion.__table__
+    if session.bind.dialect.name == "postgresql":
+        statement = postgresql.insert(table)
+    else:
+        statement = sqlite.insert(table)
+
+    await session.execute(
+        statement.values(user_id=user_id, resource=resource, version=1).on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.resource],
+            set_=dict(version=table.c.version + 1),
+        )
+    )
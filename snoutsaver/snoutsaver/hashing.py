@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+
+from . import config
+
+
+def _hash_password(plain_password: bytes) -> bytes:
+    return bcrypt.hashpw(plain_password, salt=bcrypt.gensalt())
+
+
+def _check_password(plain_password: bytes, hashed_password: bytes) -> bool:
+    return bcrypt.checkpw(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    # bcrypt is deliberately slow, so it runs in a worker pool instead of on
+    # the event loop. The semaphore caps how many hashes run at once; extra
+    # callers queue on it and the time they spend there is recorded.
+    def __init__(
+        self, executor: str = "thread", workers: int = 4, max_concurrency: int = 4
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+
+        self.executor_type = executor
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.count = 0
+        self.waiting = 0
+        self.running = 0
+        self.queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, func, *args):
+        semaphore = self._get_semaphore()
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        queue_wait = started_at - queued_at
+        self.queue_wait_seconds += queue_wait
+        self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, queue_wait)
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            semaphore.release()
+
+            hash_time = time.perf_counter() - started_at
+            self.count += 1
+            self.hash_seconds += hash_time
+            self.max_hash_seconds = max(self.max_hash_seconds, hash_time)
+
+    async def hash(self, plain_password: str) -> str:
+        hashed = await self._run(_hash_password, plain_password.encode("utf-8"))
+        return hashed.decode("utf-8")
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(
+            _check_password,
+            plain_password.encode("utf-8"),
+            hashed_password.encode("utf-8"),
+        )
+
+    def stats(self) -> dict:
+        return dict(
+            executor=self.executor_type,
+            workers=self.workers,
+            max_concurrency=self.max_concurrency,
+            count=self.count,
+            waiting=self.waiting,
+            running=self.running,
+            queue_wait_seconds=self.queue_wait_seconds,
+            max_queue_wait_seconds=self.max_queue_wait_seconds,
+            hash_seconds=self.hash_seconds,
+            max_hash_seconds=self.max_hash_seconds,
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+hasher: PasswordHasher | None = None
+
+
+def init_hasher(settings):
+    global hasher
+
+    if hasher is not None:
+        hasher.shutdown()
+
+    hasher = PasswordHasher(
+        executor=settings.PASSWORD_HASH_EXECUTOR,
+        workers=settings.PASSWORD_HASH_WORKERS,
+        max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    )
+
+
+def get_hasher() -> PasswordHasher:
+    if hasher is None:
+        init_hasher(config.get_settings())
+    return hasher
+
+
+def shutdown():
+    global hasher
+
+    if hasher is not None:
+        hasher.shutdown()
+        hasher = None
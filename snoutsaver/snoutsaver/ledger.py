@@ -0,0 +1,232 @@
+import asyncio
+import datetime
+import uuid
+
+from sqlalchemy import and_, func, insert, literal, select
+from sqlalchemy.orm import aliased
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+# A pocket's balance is the latest snapshot (or the opening balance kept on
+# the pocket) plus the ledger entries written after it. Writers only insert
+# entries; compact() folds the tail into a new snapshot now and then.
+def latest_snapshot_id(pocket_id, at: datetime.datetime | None = None):
+    snapshot = models.DBPocketSnapshot
+    statement = select(snapshot.id).where(snapshot.pocket_id == pocket_id)
+    if at is not None:
+        statement = statement.where(snapshot.last_entry_at <= at)
+    return (
+        statement.order_by(snapshot.last_entry_id.desc()).limit(1).scalar_subquery()
+    )
+
+
+def balances_statement(at: datetime.datetime | None = None):
+    pocket = models.DBPocket
+    entry = models.DBPocketLedgerEntry
+    snapshot = aliased(models.DBPocketSnapshot)
+
+    tail = select(func.coalesce(func.sum(entry.amount), 0.0)).where(
+        entry.pocket_id == pocket.id,
+        entry.id > func.coalesce(snapshot.last_entry_id, 0),
+    )
+    if at is not None:
+        tail = tail.where(entry.created_at <= at)
+
+    balance = func.coalesce(snapshot.balance, pocket.balance) + tail.scalar_subquery()
+    return select(pocket.id, balance.label("balance")).outerjoin(
+        snapshot, snapshot.id == latest_snapshot_id(pocket.id, at)
+    )
+
+
+async def get_balances(
+    session: AsyncSession, pocket_ids, at: datetime.datetime | None = None
+) -> dict[int, float]:
+    result = await session.execute(
+        balances_statement(at).where(models.DBPocket.id.in_(list(pocket_ids)))
+    )
+    return dict(result.all())
+
+
+def entry_row(
+    pocket_id: int, user_id: int, amount: float, kind: str, **values
+) -> dict:
+    return dict(
+        pocket_id=pocket_id,
+        user_id=user_id,
+        amount=amount,
+        kind=kind,
+        transfer_id=values.get("transfer_id"),
+        record_id=values.get("record_id"),
+        description=values.get("description"),
+        created_at=datetime.datetime.now(),
+    )
+
+
+async def append(session: AsyncSession, rows: list[dict]):
+    if rows:
+        await session.execute(insert(models.DBPocketLedgerEntry), rows)
+
+
+def record_entries(records, sign: int = 1) -> list[dict]:
+    # monthly setup records are a budget, no money leaves the pocket
+    return [
+        entry_row(
+            record.pocket_id,
+            record.user_id,
+            sign * (record.amount if record.type == "Income" else -record.amount),
+            "record",
+            record_id=record.id,
+            description=record.description,
+        )
+        for record in records
+        if record.pocket_id is not None and not record.is_monthly
+    ]
+
+
+async def lock_pockets(session: AsyncSession, pocket_ids):
+    # Only the pockets money leaves are locked, in id order so concurrent
+    # transfers queue up instead of deadlocking. SQLite serializes writers
+    # on its own and has no FOR UPDATE.
+    if session.bind.dialect.name == "sqlite":
+        return
+
+    await session.execute(
+        select(models.DBPocket.id)
+        .where(models.DBPocket.id.in_(sorted(pocket_ids)))
+        .order_by(models.DBPocket.id)
+        .with_for_update()
+    )
+
+
+async def transfer(
+    session: AsyncSession,
+    user_id: int,
+    from_pocket_id: int,
+    to_pocket_id: int,
+    amount: float,
+    transfer_id: str | None = None,
+) -> bool:
+    transfer_id = transfer_id or uuid.uuid4().hex
+    entry = models.DBPocketLedgerEntry
+    debit = entry_row(
+        from_pocket_id, user_id, -amount, "transfer", transfer_id=transfer_id
+    )
+
+    # The balance check and the debit are one INSERT ... SELECT, so the debit
+    # is only written while the source still covers it
+    balance = (
+        balances_statement().where(models.DBPocket.id == from_pocket_id).subquery()
+    )
+    result = await session.execute(
+        insert(entry)
+        .from_select(
+            list(debit),
+            select(*[literal(value, entry.__table__.c[name].type) for name, value in debit.items()])
+            .where(select(balance.c.balance).scalar_subquery() >= amount),
+        )
+        .returning(entry.id)
+    )
+    if result.scalar_one_or_none() is None:
+        return False
+
+    await append(
+        session,
+        [entry_row(to_pocket_id, user_id, amount, "transfer", transfer_id=transfer_id)],
+    )
+    return True
+
+
+def snapshot_statement(pocket_id: int, cutoff: datetime.datetime, now: datetime.datetime):
+    # the pocket's current balance up to its newest entry older than cutoff
+    pocket = models.DBPocket
+    entry = models.DBPocketLedgerEntry
+    snapshot = aliased(models.DBPocketSnapshot)
+    upto = aliased(models.DBPocketLedgerEntry)
+
+    last_entry_id = (
+        select(func.max(upto.id))
+        .where(upto.pocket_id == pocket.id, upto.created_at <= cutoff)
+        .scalar_subquery()
+    )
+    source = (
+        select(
+            pocket.id,
+            func.max(entry.id),
+            func.max(entry.created_at),
+            func.coalesce(snapshot.balance, pocket.balance) + func.sum(entry.amount),
+            literal(now),
+        )
+        .select_from(pocket)
+        .outerjoin(snapshot, snapshot.id == latest_snapshot_id(pocket.id))
+        .join(
+            entry,
+            and_(
+                entry.pocket_id == pocket.id,
+                entry.id > func.coalesce(snapshot.last_entry_id, 0),
+                entry.id <= last_entry_id,
+            ),
+        )
+        .where(pocket.id == pocket_id)
+        .group_by(pocket.id, snapshot.balance, pocket.balance)
+    )
+    return insert(models.DBPocketSnapshot).from_select(
+        ["pocket_id", "last_entry_id", "last_entry_at", "balance", "created_at"],
+        source,
+    )
+
+
+async def compact(session: AsyncSession, grace_seconds: int = 60) -> int:
+    # Ledger ids are assigned at INSERT, not at commit, so an entry still in
+    # flight can commit below the id a snapshot was taken at. Every entry
+    # INSERT holds a FOR KEY SHARE lock on its pocket through the foreign key
+    # until it commits; locking the pocket FOR UPDATE first waits for those
+    # and keeps new ones out while its snapshot is written. One pocket per
+    # transaction, so compaction never holds one lock while waiting for
+    # another, and a second compactor finds nothing left to fold. SQLite
+    # has a single writer and needs no lock.
+    now = datetime.datetime.now()
+    cutoff = now - datetime.timedelta(seconds=grace_seconds)
+
+    pocket = models.DBPocket
+    entry = models.DBPocketLedgerEntry
+    snapshot = aliased(models.DBPocketSnapshot)
+
+    result = await session.execute(
+        select(pocket.id)
+        .outerjoin(snapshot, snapshot.id == latest_snapshot_id(pocket.id))
+        .where(
+            select(entry.id)
+            .where(
+                entry.pocket_id == pocket.id,
+                entry.id > func.coalesce(snapshot.last_entry_id, 0),
+                entry.created_at <= cutoff,
+            )
+            .exists()
+        )
+        .order_by(pocket.id)
+    )
+    pocket_ids = result.scalars().all()
+    await session.commit()
+
+    snapshots = 0
+    for pocket_id in pocket_ids:
+        await session.execute(
+            select(pocket.id).where(pocket.id == pocket_id).with_for_update()
+        )
+        result = await session.execute(snapshot_statement(pocket_id, cutoff, now))
+        await session.commit()
+        snapshots += result.rowcount
+    return snapshots
+
+
+async def compact_periodically(interval_seconds: int, grace_seconds: int):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async for session in models.get_session():
+                snapshots = await compact(session, grace_seconds)
+                print("ledger compacted", snapshots)
+        except Exception as error:
+            print("ledger compaction failed", error)
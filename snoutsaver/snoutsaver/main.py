@@ -1,30 +1,78 @@
-# ssl patch
-from gevent import monkey
+from . import config
+
+# gevent monkey-patching is opt-in; it has to happen before the socket and
+# ssl layers are imported by the rest of the app
+if config.get_settings().GEVENT_MONKEY_PATCH:
+    from gevent import monkey
 
-monkey.patch_all()
+    monkey.patch_all()
+
+import asyncio
+import time
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from . import models
 from . import routers
-from . import config
-from . import seed_data
+from . import bootstrap
+from . import caches
+from . import hashing
+from . import metrics
+from . import querycount
+from . import ledger
+from . import responses
+from . import compression
 
 def create_app(settings=None):
     settings = config.get_settings()
-    app = FastAPI()
+    app = FastAPI(
+        default_response_class=(
+            responses.PydanticJSONResponse if settings.FAST_JSON_RESPONSE else JSONResponse
+        )
+    )
 
     models.init_db(settings)
+    hashing.init_hasher(settings)
     
     routers.init_router(app)
+    app.add_middleware(compression.CompressionMiddleware)
+    app.add_middleware(querycount.QueryCountMiddleware)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    background_tasks = set()
 
     @app.on_event("startup")
     async def on_startup():
-        await models.create_all()
+        started_at = time.perf_counter()
+        bootstrapped = await bootstrap.bootstrap()
         async for session in models.get_session():
-            await seed_data.seed_default_categories(session)
+            await caches.category_cache.load(session)
+
+        # with several workers every one of them would run the loop; use
+        # scripts/compact-ledger.py from cron instead
+        if settings.LEDGER_COMPACT_INTERVAL_SECONDS > 0 and settings.SERVER_WORKERS > 1:
+            print("ledger compaction disabled with SERVER_WORKERS > 1, run scripts/compact-ledger.py")
+        elif settings.LEDGER_COMPACT_INTERVAL_SECONDS > 0:
+            background_tasks.add(
+                asyncio.create_task(
+                    ledger.compact_periodically(
+                        settings.LEDGER_COMPACT_INTERVAL_SECONDS,
+                        settings.LEDGER_COMPACT_GRACE_SECONDS,
+                    )
+                )
+            )
+
+        metrics.metrics.startup_seconds = time.perf_counter() - started_at
+        print(
+            f"startup took {metrics.metrics.startup_seconds:.3f}s",
+            "(schema bootstrapped)" if bootstrapped else "(schema up to date)",
+        )
 
     @app.on_event("shutdown")
     async def on_shutdown():
+        for task in background_tasks:
+            task.cancel()
         await models.close_session()
+        hashing.shutdown()
 
     return app
\ No newline at end of file
@@ -0,0 +1,193 @@
+import time
+
+from . import caches
+from . import hashing
+from . import models
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"
+PREFIX = "snoutsaver_"
+
+# Monotonic statistics are exported as counters under these names, every
+# other numeric statistic is a point-in-time gauge named after itself
+POOL_COUNTERS = dict(
+    connects="connects_total",
+    checkouts="checkouts_total",
+    checkins="checkins_total",
+    timeouts="timeouts_total",
+    wait_seconds="wait_seconds_total",
+)
+CACHE_COUNTERS = dict(
+    hits="hits_total",
+    misses="misses_total",
+    evictions="evictions_total",
+)
+HASH_COUNTERS = dict(
+    count="hashes_total",
+    queue_wait_seconds="queue_wait_seconds_total",
+    hash_seconds="hash_seconds_total",
+)
+
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.startup_seconds: float | None = None
+        self.requests: dict[tuple[str, str, str], int] = {}
+        # (method, route) -> per-bucket counts, plus the sum and count
+        self.latency: dict[tuple[str, str], list] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, str(status))
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        histogram = self.latency.setdefault(
+            (method, route), [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+        )
+        buckets, _, _ = histogram
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def reset(self):
+        self.requests.clear()
+        self.latency.clear()
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware so streaming responses are timed until their
+    # last chunk. Routes are labelled by template, e.g. /records/{record_id}.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.observe(
+                scope["method"],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                status,
+                time.perf_counter() - started_at,
+            )
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    lines = []
+
+    def metric(name: str, type: str, help: str, samples):
+        name = PREFIX + name
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {type}")
+        for sample_name, labels, value in samples:
+            lines.append(f"{PREFIX}{sample_name}{_labels(**labels)} {_format(value)}")
+
+    def stats_metrics(family: str, help: str, labelled_stats, counters: dict):
+        # one family per statistic, e.g. db_pool_checkouts_total and
+        # db_pool_checked_out, labelled_stats is [(labels, stats), ...]
+        names = []
+        for _, stats in labelled_stats:
+            names += [
+                stat for stat, value in stats.items()
+                if stat not in names and isinstance(value, (int, float))
+            ]
+        for stat in names:
+            if stat in counters:
+                name, type = f"{family}_{counters[stat]}", "counter"
+            else:
+                name, type = f"{family}_{stat}", "gauge"
+            metric(
+                name, type, f"{help}: {stat}.",
+                [(name, labels, stats[stat]) for labels, stats in labelled_stats if stat in stats],
+            )
+
+    metric(
+        "http_requests_in_flight", "gauge", "Requests currently being served.",
+        [("http_requests_in_flight", {}, metrics.in_flight)],
+    )
+    if metrics.startup_seconds is not None:
+        metric(
+            "app_startup_seconds", "gauge", "Time the startup hook took.",
+            [("app_startup_seconds", {}, metrics.startup_seconds)],
+        )
+    metric(
+        "http_requests_total", "counter", "Requests by method, route and status code.",
+        [
+            ("http_requests_total", dict(method=method, route=route, status=status), count)
+            for (method, route, status), count in sorted(metrics.requests.items())
+        ],
+    )
+
+    samples = []
+    for (method, route), (buckets, total, count) in sorted(metrics.latency.items()):
+        for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+            samples.append(
+                ("http_request_duration_seconds_bucket", dict(method=method, route=route, le=bound), bucket_count)
+            )
+        samples.append(("http_request_duration_seconds_bucket", dict(method=method, route=route, le="+Inf"), count))
+        samples.append(("http_request_duration_seconds_sum", dict(method=method, route=route), total))
+        samples.append(("http_request_duration_seconds_count", dict(method=method, route=route), count))
+    metric(
+        "http_request_duration_seconds", "histogram", "Request latency by method and route.",
+        samples,
+    )
+
+    if models.engine is not None:
+        stats_metrics(
+            "db_pool", "Database connection pool", [({}, models.get_pool_stats())], POOL_COUNTERS
+        )
+
+    stats_metrics(
+        "cache", "In-process cache",
+        [
+            (dict(cache="category"), caches.category_cache.stats()),
+            (dict(cache="token"), caches.token_cache.stats()),
+            (dict(cache="user"), caches.user_cache.stats()),
+        ],
+        CACHE_COUNTERS,
+    )
+
+    if hashing.hasher is not None:
+        stats_metrics(
+            "password_hash", "Password hashing pool", [({}, hashing.hasher.stats())], HASH_COUNTERS
+        )
+
+    return "\n".join(lines) + "\n"
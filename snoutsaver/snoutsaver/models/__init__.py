@@ -1,10 +1,17 @@
 from typing import Optional, AsyncIterator
 
+import time
+
 from sqlmodel import Field, SQLModel, create_engine, Session, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import event, exc, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .. import querycount
 
 from . import users
 from . import categories
@@ -15,35 +22,146 @@ from .categories import *
 from .records import *
 from .setups import *
 from .pockets import *
+from .rollups import *
+from .ledger import *
+from .bootstrap import *
+from .versions import *
+from .tokens import *
 
 connect_args = {}
 
 engine = None
+session_factory = None
+
+
+class PoolStats:
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    # Time spent in Pool.connect(), the public entry point the engine checks
+    # connections out through: waiting for a free connection plus overflow
+    # connects. Checkouts, checkins and connects come from pool events.
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            # pool exhausted for pool_timeout seconds; connection errors are
+            # not timeouts
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started_at)
+
+
+def get_pool_stats() -> dict:
+    stats = dict(
+        connects=pool_stats.connects,
+        checkouts=pool_stats.checkouts,
+        checkins=pool_stats.checkins,
+        timeouts=pool_stats.timeouts,
+        wait_seconds=pool_stats.wait_seconds,
+        max_wait_seconds=pool_stats.max_wait_seconds,
+    )
+
+    pool = engine.pool if engine is not None else None
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
 
 
 def init_db(settings):
-    global engine
+    global engine, session_factory
 
-    engine = create_async_engine(
-        settings.SQLDB_URL,
-        echo=True,
+    url = make_url(settings.SQLDB_URL)
+    options = dict(
+        echo=settings.DB_ECHO,
         future=True,
         connect_args=connect_args,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
     )
 
+    # in-memory SQLite keeps its single-connection pool
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+
+    engine = create_async_engine(url, **options)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_stats.connects += 1
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_stats.checkouts += 1
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_stats.checkins += 1
+
+    querycount.install(engine.sync_engine)
+
+    session_factory = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+def create_tables_and_indexes(connection):
+    SQLModel.metadata.create_all(connection)
+    # create_all only creates the indexes of tables it creates itself
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
 async def create_all():
     async with engine.begin() as conn:
         # await conn.run_sync(SQLModel.metadata.drop_all)
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(create_tables_and_indexes)
 
 async def recreate_table():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.drop_all)
         await conn.run_sync(SQLModel.metadata.create_all)
 
+async def insert_returning_ids(session: AsyncSession, model, rows: list[dict]) -> list[int]:
+    # One executemany INSERT ... RETURNING, ids in the order of rows.
+    # SQLAlchemy falls back to a statement per row when asked to keep the
+    # order on SQLite, where a multi-row VALUES allocates rowids in order anyway.
+    if session.bind.dialect.name == "sqlite":
+        ids = await session.scalars(insert(model).returning(model.id), rows)
+        return sorted(ids.all())
+
+    ids = await session.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    )
+    return ids.all()
+
 async def get_session() -> AsyncIterator[AsyncSession]:
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+    async with session_factory() as session:
         yield session
 
 async def close_session():
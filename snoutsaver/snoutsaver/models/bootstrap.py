@@ -0,0 +1,11 @@
+import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class DBBootstrapState(SQLModel, table=True):
+    __tablename__ = "bootstrap_state"
+    # schema and seed data version the database was last bootstrapped with
+    key: str = Field(primary_key=True)
+    version: str
+    updated_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
@@ -1,6 +1,7 @@
 from typing import Optional, List
 from pydantic import BaseModel, ConfigDict
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
 
 
 class BaseCategory(BaseModel):
@@ -27,6 +28,10 @@ class Category(BaseCategory):
 
 class DBCategory(Category, SQLModel, table=True):
     __tablename__ = "categories"
+    # the same name may exist once per type, e.g. "Other" income and expense
+    __table_args__ = (
+        Index("ix_categories_name_type", "name", "type", unique=True),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     type: str
@@ -38,5 +43,6 @@ class CategoryList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     items: list[Category]
     page: int
-    page_size: int
+    page_size: int # number of pages
     size_per_page: int
+    total: int = 0
@@ -0,0 +1,74 @@
+import datetime
+
+from pydantic import BaseModel, ConfigDict
+from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
+
+
+class DBPocketLedgerEntry(SQLModel, table=True):
+    __tablename__ = "pocket_ledger"
+    # append-only; a pocket's balance is its opening balance plus every entry
+    __table_args__ = (
+        Index("ix_pocket_ledger_pocket_id_id", "pocket_id", "id"),
+        Index("ix_pocket_ledger_pocket_id_created_at", "pocket_id", "created_at"),
+        # newest entry per user, for the pocket list ETag
+        Index("ix_pocket_ledger_user_id_id", "user_id", "id"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+
+    pocket_id: int = Field(foreign_key="pockets.id")
+    user_id: int = Field(foreign_key="users.id")
+
+    amount: float  # signed, negative for money leaving the pocket
+    kind: str  # transfer, record or adjustment
+    transfer_id: str | None = Field(default=None)  # shared by both legs
+    record_id: int | None = Field(default=None)  # no FK, entries outlive records
+    description: str | None = Field(default=None)
+
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+
+
+class DBPocketSnapshot(SQLModel, table=True):
+    __tablename__ = "pocket_snapshots"
+    # balance after every entry up to last_entry_id; older snapshots are kept
+    # so balances in the past start from the nearest one
+    __table_args__ = (
+        Index("ix_pocket_snapshots_pocket_id_last_entry_id", "pocket_id", "last_entry_id"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+
+    pocket_id: int = Field(foreign_key="pockets.id")
+    last_entry_id: int
+    last_entry_at: datetime.datetime
+    balance: float
+
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+
+
+class LedgerEntry(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    pocket_id: int
+    amount: float
+    kind: str
+    transfer_id: str | None = None
+    record_id: int | None = None
+    description: str | None = None
+    created_at: datetime.datetime
+
+class LedgerEntryList(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    items: list[LedgerEntry]
+    page: int
+    page_size: int # number of pages
+    size_per_page: int
+    total: int = 0
+
+class PocketAdjustment(BaseModel):
+    amount: float
+    description: str | None = None
+
+class PocketBalance(BaseModel):
+    pocket_id: int
+    balance: float
+    at: datetime.datetime | None = None
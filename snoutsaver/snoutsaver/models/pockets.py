@@ -1,6 +1,9 @@
 from typing import Optional, List
+import pydantic
+
 from pydantic import BaseModel, ConfigDict
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
 
 from . import users
 from . import records
@@ -32,17 +35,29 @@ class UpdatedPocket(BasePocket):
 class PocketTransfer(BaseModel):
     from_pocket_id: int = Field(default=None, foreign_key="pockets.id")
     to_pocket_id: int = Field(default=None, foreign_key="pockets.id")
-    amount: float 
+    amount: float = Field(gt=0)
+
+class PocketTransferBatch(BaseModel):
+    # every leg succeeds or none does
+    transfers: list[PocketTransfer] = pydantic.Field(min_length=1, max_length=100)
+
+class PocketTransferBatchResult(BaseModel):
+    message: str
+    balances: dict[int, float]
 
 class DBPocket(SQLModel, table=True):
     __tablename__ = "pockets"
+    # pockets of a user in id order, also the pocket list ETag
+    __table_args__ = (
+        Index("ix_pockets_user_id_id", "user_id", "id"),
+    )
     id: int | None = Field(default=None, primary_key=True)
 
     user_id: int = Field(default=None, foreign_key="users.id")
     user: users.DBUser = Relationship()
 
     name: str
-    balance: float
+    balance: float # opening balance, the current one comes from the ledger
 
     # category: List[categories.DBCategory] = Relationship()
     # monthly_expenses: List[records.DBRecord] = Relationship()
@@ -58,5 +73,6 @@ class PocketList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     items: list[AllPocket]
     page: int
-    page_size: int
-    size_per_page: int
\ No newline at end of file
+    page_size: int # number of pages
+    size_per_page: int
+    total: int = 0
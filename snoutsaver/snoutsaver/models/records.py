@@ -5,6 +5,7 @@ from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
 
 # from snoutsaver.snoutsaver.models.pockets import DBPocket
 
@@ -53,6 +54,16 @@ class UpdatedRecord(BaseRecord):
 
 class DBRecord(BaseRecord, SQLModel, table=True):
     __tablename__ = "records"
+    # keyset pagination walks (record_date, id) per user, optionally narrowed
+    # by one of the list filters
+    __table_args__ = (
+        Index("ix_records_user_id_record_date_id", "user_id", "record_date", "id"),
+        Index("ix_records_user_id_type_record_date_id", "user_id", "type", "record_date", "id"),
+        Index("ix_records_user_id_category_id_record_date_id", "user_id", "category_id", "record_date", "id"),
+        Index("ix_records_user_id_pocket_id_record_date_id", "user_id", "pocket_id", "record_date", "id"),
+        # monthly expenses of a setup
+        Index("ix_records_setup_id_type_is_monthly", "setup_id", "type", "is_monthly"),
+    )
     id: int | None = Field(default=None, primary_key=True)
 
     user_id: int = Field(default=None, foreign_key="users.id")
@@ -78,6 +89,32 @@ class DBRecord(BaseRecord, SQLModel, table=True):
     #pocket_id: int = Field(default=None, foreign_key="pockets.id")
     #pocket: Optional["DBPocket"] = Relationship(back_populates="monthly_expenses")
 
+class BulkCreateRecord(BaseModel):
+    records: list[CreateRecord] = pydantic.Field(min_length=1, max_length=1000)
+
+class BulkRecordResult(BaseModel):
+    index: int
+    status: str  # created or error
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkRecordResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkRecordResult]
+
+class MonthlySummary(BaseModel):
+    month: str  # YYYY-MM
+    type: str
+    category_id: int
+    category_name: str
+    total: float
+    count: int
+
+class RecordSummary(BaseModel):
+    items: list[MonthlySummary]
+
 class RecordList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     records: list[Records]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,14 @@
+from sqlmodel import Field, SQLModel
+
+
+class DBRecordRollup(SQLModel, table=True):
+    __tablename__ = "record_rollups"
+    # one row per user, month, category and type, kept in step with records
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    month: str = Field(primary_key=True)  # YYYY-MM
+    category_id: int = Field(primary_key=True)
+    type: str = Field(primary_key=True)
+
+    category_name: str
+    total: float = Field(default=0)
+    count: int = Field(default=0)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import List, Optional
 
 from . import users
@@ -27,6 +28,9 @@ class UpdatedSetup(BaseSetup):
 
 class DBSetup(SQLModel, table=True):
     __tablename__ = "setups"
+    __table_args__ = (
+        Index("ix_setups_user_id", "user_id"),
+    )
     id: int | None = Field(default=None, primary_key=True)
 
     user_id: int = Field(default=None, foreign_key="users.id")
@@ -42,5 +46,6 @@ class SetupList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     items: list[Setups]
     page: int
-    page_size: int
-    size_per_page: int
\ No newline at end of file
+    page_size: int # number of pages
+    size_per_page: int
+    total: int = 0
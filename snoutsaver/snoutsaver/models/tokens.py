@@ -0,0 +1,25 @@
+import datetime
+
+from pydantic import BaseModel
+from sqlmodel import Field, SQLModel
+
+
+class RefreshToken(BaseModel):
+    refresh_token: str
+
+
+class DBRevokedToken(SQLModel, table=True):
+    __tablename__ = "revoked_tokens"
+    # refresh tokens used once with REFRESH_TOKEN_ROTATION enabled; rows can
+    # be deleted once expires_at has passed, the token is rejected anyway
+    jti: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="users.id")
+    expires_at: datetime.datetime
+
+
+class DBTokenRevocation(SQLModel, table=True):
+    __tablename__ = "token_revocations"
+    # refresh tokens of the user issued before revoked_at are rejected,
+    # moved forward whenever the password changes
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    revoked_at: datetime.datetime
@@ -1,13 +1,15 @@
 import pydantic
 import datetime
-import bcrypt
 
 from pydantic import BaseModel, ConfigDict
 
 from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
 
 from typing import Optional
 
+from .. import hashing
+
 class BaseUser(BaseModel):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
     email: str = pydantic.Field(json_schema_extra={"example":"user@email.local", "unique": True})
@@ -22,6 +24,12 @@ class User(BaseUser):
         json_schema_extra=dict(example="2023-01-01T00:00:00.000000"), default=None
     )
 
+class CurrentUser(User):
+    first_name: str | None = None
+    last_name: str | None = None
+    profile_picture: str | None = None
+    provider: str | None = None
+
 class RegisterUser(BaseUser):
     password: str = pydantic.Field(json_schema_extra=dict(example="password", minLength=8))
     confirm_password: str = pydantic.Field(json_schema_extra=dict(example="confirm_password"))
@@ -59,6 +67,11 @@ class Token(BaseModel):
 
 class DBUser(BaseUser, SQLModel, table=True):
     __tablename__ = "users"
+    # /token and create_user look users up by either column
+    __table_args__ = (
+        Index("ix_users_username", "username", unique=True),
+        Index("ix_users_email", "email", unique=True),
+    )
     id: int | None = Field(default=None, primary_key=True)
 
     first_name: str | None = Field(default=None)
@@ -72,22 +85,19 @@ class DBUser(BaseUser, SQLModel, table=True):
     last_login_date: datetime.datetime | None = Field(default=None)
 
     async def get_encrypted_password(self, plain_password):
-        return bcrypt.hashpw(
-            plain_password.encode("utf-8"), salt=bcrypt.gensalt()
-        ).decode("utf-8")
+        return await hashing.get_hasher().hash(plain_password)
 
     async def set_password(self, plain_password):
         self.password = await self.get_encrypted_password(plain_password)
 
     async def verify_password(self, plain_password):
-        return bcrypt.checkpw(
-            plain_password.encode("utf-8"), self.password.encode("utf-8")
-        )
+        return await hashing.get_hasher().verify(plain_password, self.password)
     
 class UserList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     items: list[GetUser]
     page: int
-    page_size: int
+    page_size: int # number of pages
     size_per_page: int
+    total: int = 0
 
@@ -0,0 +1,10 @@
+from sqlmodel import Field, SQLModel
+
+
+class DBResourceVersion(SQLModel, table=True):
+    __tablename__ = "resource_versions"
+    # bumped in the same transaction as every write to a user's resource,
+    # conditional GETs compare ETags against it without loading the resource
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    resource: str = Field(primary_key=True)
+    version: int = Field(default=0)
@@ -0,0 +1,87 @@
+import math
+
+from typing import Annotated
+
+from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import config
+
+
+settings = config.get_settings()
+
+
+class Page(BaseModel):
+    page: int = 1
+    size_per_page: int = 50
+
+    @property
+    def offset(self) -> int:
+        return (self.page - 1) * self.size_per_page
+
+
+async def get_page(
+    page: Annotated[int, Query(ge=1)] = 1,
+    size_per_page: Annotated[int, Query(ge=1, le=500)] = 50,
+) -> Page:
+    return Page(page=page, size_per_page=size_per_page)
+
+
+async def estimate_rows(session: AsyncSession, table_name: str) -> int | None:
+    # Postgres keeps a row estimate per table that costs nothing to read,
+    # other databases fall back to an exact count.
+    if session.bind.dialect.name != "postgresql":
+        return None
+
+    result = await session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+        dict(name=table_name),
+    )
+    estimate = result.scalar_one_or_none()
+    if estimate is None or estimate < settings.PAGINATION_ESTIMATE_THRESHOLD:
+        return None
+    return estimate
+
+
+async def count_rows(
+    session: AsyncSession, statement, estimate_table: str | None = None
+) -> int:
+    # estimate_table is only safe for statements without a WHERE clause
+    if estimate_table:
+        estimate = await estimate_rows(session, estimate_table)
+        if estimate is not None:
+            return estimate
+
+    result = await session.exec(
+        select(func.count()).select_from(statement.order_by(None).subquery())
+    )
+    return result.one()
+
+
+def page_info(page: Page, total: int) -> dict:
+    return dict(
+        page=page.page,
+        page_size=math.ceil(total / page.size_per_page),
+        size_per_page=page.size_per_page,
+        total=total,
+    )
+
+
+async def paginate(
+    session: AsyncSession, statement, page: Page, estimate_table: str | None = None
+) -> dict:
+    total = await count_rows(session, statement, estimate_table)
+    result = await session.exec(
+        statement.offset(page.offset).limit(page.size_per_page)
+    )
+    return dict(items=result.all(), **page_info(page, total))
+
+
+def paginate_list(items: list, page: Page) -> dict:
+    return dict(
+        items=items[page.offset : page.offset + page.size_per_page],
+        **page_info(page, len(items)),
+    )
@@ -0,0 +1,101 @@
+import contextlib
+import contextvars
+import logging
+import time
+
+from sqlalchemy import event
+
+from . import config
+
+
+settings = config.get_settings()
+
+logger = logging.getLogger(__name__)
+
+# Counters active in the current request or test; every statement executed
+# while a counter is active is added to it.
+_active_counters: contextvars.ContextVar[tuple["QueryCounter", ...]] = contextvars.ContextVar(
+    "active_query_counters", default=()
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: list[str] = []
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append(statement)
+
+    def repeated(self, times: int = 2) -> dict[str, int]:
+        # the same SQL executed over and over is the usual N+1 signature
+        counts = {}
+        for statement in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return {statement: count for statement, count in counts.items() if count >= times}
+
+
+@contextlib.contextmanager
+def count_queries():
+    counter = QueryCounter()
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+def install(engine):
+    # The start time lives on the execution context, which is discarded with
+    # the statement, so a statement that raises leaves nothing behind on the
+    # pooled connection
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _active_counters.get():
+            context._query_started_at = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counters = _active_counters.get()
+        started_at = getattr(context, "_query_started_at", None)
+        if not counters or started_at is None:
+            return
+
+        seconds = time.perf_counter() - started_at
+        for counter in counters:
+            counter.record(statement, seconds)
+
+
+class QueryCountMiddleware:
+    # Reports the statements and DB time spent per request as response
+    # headers, only when DB_QUERY_HEADERS is enabled.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.DB_QUERY_HEADERS:
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counter:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-query-count", str(counter.count).encode()),
+                        (b"x-db-query-time-ms", f"{counter.seconds * 1000:.2f}".encode()),
+                    ]
+
+                    repeated = counter.repeated(settings.DB_QUERY_REPEAT_WARNING)
+                    if repeated:
+                        logger.warning(
+                            "repeated queries %s %s %s",
+                            scope["method"], scope["path"], list(repeated.values()),
+                        )
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,54 @@
+import functools
+
+import pydantic_core
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from . import config
+
+
+settings = config.get_settings()
+
+
+class PydanticJSONResponse(JSONResponse):
+    # pydantic-core writes the JSON bytes itself, for models as well as the
+    # plain data FastAPI hands over after checking a response_model
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+def columns_for(model: type[BaseModel], table_model) -> list:
+    # the table columns a response model needs, in the model's field order
+    columns = table_model.__table__.columns
+    return [getattr(table_model, name) for name in model.model_fields if name in columns]
+
+
+@functools.cache
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def models_from_rows(model: type[BaseModel], rows) -> list:
+    # Rows selected with columns_for() skip ORM entities entirely; validating
+    # their mappings in pydantic-core is faster than model_construct()
+    return _list_adapter(model).validate_python([row._mapping for row in rows])
+
+
+def model_response(model: BaseModel, response: Response | None = None):
+    # Returning a Response skips FastAPI's second validation and
+    # jsonable_encoder pass over a model the handler already built.
+    # Headers set on the injected response are carried over.
+    if not settings.FAST_JSON_RESPONSE:
+        return model
+
+    headers = None
+    if response is not None:
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name != "content-length"
+        }
+    return PydanticJSONResponse(model, headers=headers)
@@ -0,0 +1,109 @@
+import datetime
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+def month_of(column, dialect_name: str):
+    if dialect_name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def is_month_start(value: datetime.datetime | None) -> bool:
+    return value is None or (
+        value.day == 1 and value.time() == datetime.time(0, 0)
+    )
+
+
+# Deltas are collected per (user_id, month, category_id, type) while a
+# handler changes records, then written with apply() before its commit.
+def add_record(deltas: dict, record, sign: int = 1):
+    key = (
+        record.user_id,
+        record.record_date.strftime("%Y-%m"),
+        record.category_id,
+        record.type,
+    )
+    total, count, _ = deltas.get(key, (0.0, 0, None))
+    deltas[key] = (
+        total + sign * record.amount,
+        count + sign,
+        record.category_name,
+    )
+
+
+def records_delta(records, sign: int = 1) -> dict:
+    deltas = {}
+    for record in records:
+        add_record(deltas, record, sign)
+    return deltas
+
+
+def upsert_statement(dialect_name: str):
+    table = models.DBRecordRollup.__table__
+    if dialect_name == "postgresql":
+        statement = postgresql.insert(table)
+    else:
+        statement = sqlite.insert(table)
+
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.month, table.c.category_id, table.c.type],
+        set_=dict(
+            total=table.c.total + statement.excluded.total,
+            count=table.c.count + statement.excluded.count,
+            category_name=statement.excluded.category_name,
+        ),
+    )
+
+
+async def apply(session: AsyncSession, deltas: dict):
+    rows = [
+        dict(
+            user_id=user_id,
+            month=month,
+            category_id=category_id,
+            type=type,
+            category_name=category_name,
+            total=total,
+            count=count,
+        )
+        for (user_id, month, category_id, type), (total, count, category_name) in deltas.items()
+        if total or count
+    ]
+    if rows:
+        await session.execute(upsert_statement(session.bind.dialect.name), rows)
+
+
+async def rebuild(session: AsyncSession, user_id: int | None = None):
+    rollup = models.DBRecordRollup.__table__
+    record = models.DBRecord
+
+    clear = delete(rollup)
+    if user_id is not None:
+        clear = clear.where(rollup.c.user_id == user_id)
+    await session.execute(clear)
+
+    month = month_of(record.record_date, session.bind.dialect.name)
+    source = select(
+        record.user_id,
+        month,
+        record.category_id,
+        record.type,
+        func.max(record.category_name),
+        func.sum(record.amount),
+        func.count(record.id),
+    ).group_by(record.user_id, month, record.category_id, record.type)
+    if user_id is not None:
+        source = source.where(record.user_id == user_id)
+
+    await session.execute(
+        insert(rollup).from_select(
+            ["user_id", "month", "category_id", "type", "category_name", "total", "count"],
+            source,
+        )
+    )
+    await session.commit()
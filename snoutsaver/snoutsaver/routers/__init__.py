@@ -5,6 +5,7 @@ from . import records
 from . import categories
 from . import setups
 from . import pockets
+from . import metrics
 
 def init_router(app):
     app.include_router(root.router)
@@ -14,3 +15,4 @@ def init_router(app):
     app.include_router(categories.router)
     app.include_router(setups.router)
     app.include_router(pockets.router)
+    app.include_router(metrics.router)
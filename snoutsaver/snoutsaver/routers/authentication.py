@@ -7,13 +7,16 @@ from fastapi.security import (
 )
 
 
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 from typing import Annotated
 import datetime
+import jwt
 
 from .. import config
 from .. import models
 from .. import security
+from .. import caches
 
 router = APIRouter(tags=["Authentication"])
 
@@ -44,7 +47,6 @@ async def authentication(
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username")
 
-    print("userx", user, await user.verify_password(form_data.password))
     if not await user.verify_password(form_data.password):
         raise HTTPException(status_code=401, detail="Incorrect password")
 
@@ -53,6 +55,7 @@ async def authentication(
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    caches.put_user(user)
 
     access_token_expires = datetime.timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -77,4 +80,86 @@ async def authentication(
         expires_at=datetime.datetime.now() + refresh_token_expires,
         issued_at=user.last_login_date,
         user_id=user.id,
-    )
\ No newline at end of file
+    )
+
+
+@router.post(
+    "/token/refresh",
+)
+async def refresh_authentication(
+    token: models.RefreshToken,
+    session: Annotated[models.AsyncSession, Depends(models.get_session)],
+) -> models.Token:
+    # The signed refresh token is the credential: no password hash to verify
+    # and no last_login_date write
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    try:
+        payload = jwt.decode(
+            token.refresh_token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+    except jwt.PyJWTError:
+        raise credentials_exception
+
+    user_id = payload.get("sub")
+    jti = payload.get("jti")
+    if payload.get("type") != security.REFRESH_TOKEN or user_id is None or jti is None:
+        raise credentials_exception
+
+    # Read from the database, not the user cache: a deleted user or a
+    # password change must stop refreshes in every worker right away
+    revocation = models.DBTokenRevocation
+    result = await session.exec(
+        select(models.DBUser.id, revocation.revoked_at)
+        .outerjoin(revocation, revocation.user_id == models.DBUser.id)
+        .where(models.DBUser.id == user_id)
+    )
+    user = result.one_or_none()
+    if user is None:
+        raise credentials_exception
+
+    _, revoked_at = user
+    if revoked_at is not None and payload.get("iat", 0) < revoked_at.timestamp():
+        raise credentials_exception
+
+    refresh_token = token.refresh_token
+    expires_at = datetime.datetime.fromtimestamp(payload["exp"])
+    refresh_token_expires = datetime.timedelta(
+        minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
+    )
+
+    if settings.REFRESH_TOKEN_ROTATION:
+        # the primary key makes a second use of the same token fail
+        session.add(models.DBRevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise credentials_exception
+
+        refresh_token = security.create_refresh_token(
+            data={"sub": user_id},
+            expires_delta=refresh_token_expires,
+        )
+        expires_at = datetime.datetime.now() + refresh_token_expires
+    elif await session.get(models.DBRevokedToken, jti) is not None:
+        raise credentials_exception
+
+    return models.Token(
+        access_token=security.create_access_token(
+            data={"sub": user_id},
+            expires_delta=datetime.timedelta(
+                minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+            ),
+        ),
+        refresh_token=refresh_token,
+        token_type="Bearer",
+        scope="",
+        expires_in=settings.REFRESH_TOKEN_EXPIRE_MINUTES,
+        expires_at=expires_at,
+        issued_at=datetime.datetime.now(),
+    )
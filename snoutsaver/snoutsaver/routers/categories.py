@@ -1,16 +1,18 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .. import models, deps
+from .. import models, deps, caches, pagination, etags, config
 
 router = APIRouter(tags=["Category"], prefix="/categories")
 
+settings = config.get_settings()
+
 # Create Category
 @router.post("")
 async def create_category(
     category: models.CreatedCategory,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> models.Category:
     
@@ -27,46 +29,62 @@ async def create_category(
     await session.commit()
     await session.refresh(db_category)
 
-    return models.Category.model_validate(db_category)
+    return caches.category_cache.put(db_category)
 
 # Get All Categories
 @router.get("")
 async def read_all_categories(
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
-    session: Annotated[AsyncSession, Depends(models.get_session)]
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    page: Annotated[pagination.Page, Depends(pagination.get_page)],
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> models.CategoryList:
     
-    result = await session.exec(select(models.DBCategory))
-    categories = result.all()
+    categories = await caches.category_cache.all(session)
 
     if not categories:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    etag = etags.make_etag(caches.category_cache.etag(), page.page, page.size_per_page)
+    headers = {"Cache-Control": settings.CATEGORY_CACHE_CONTROL}
+    if etags.etag_matches(if_none_match, etag):
+        return etags.not_modified(etag, headers)
+
+    response.headers.update({"ETag": etag, **headers})
     return models.CategoryList.model_validate(
-        dict(items=categories, page_size=0, page=0, size_per_page=0)
+        pagination.paginate_list(categories, page)
     )
 
 # Get Category by ID
 @router.get("/{category_id}")
 async def read_category(
     category_id: int,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
-    session: Annotated[AsyncSession, Depends(models.get_session)]
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> models.Category:
     
-    db_category = await session.get(models.DBCategory, category_id)
+    category = await caches.category_cache.get(session, category_id)
 
-    if not db_category:
+    if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    
-    return models.Category.model_validate(db_category)
+
+    etag = etags.make_etag(category.model_dump())
+    headers = {"Cache-Control": settings.CATEGORY_CACHE_CONTROL}
+    if etags.etag_matches(if_none_match, etag):
+        return etags.not_modified(etag, headers)
+
+    response.headers.update({"ETag": etag, **headers})
+    return category
 
 # Update Category
 @router.put("/{category_id}")
 async def update_category(
     category_id: int,
     category: models.UpdatedCategory,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> models.Category:
     
@@ -95,13 +113,13 @@ async def update_category(
     await session.commit()
     await session.refresh(db_category)
 
-    return models.Category.model_validate(db_category)
+    return caches.category_cache.put(db_category)
 
 # Delete Category
 @router.delete("/{category_id}")
 async def delete_category(
     category_id: int,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> dict:
     
@@ -112,5 +130,6 @@ async def delete_category(
     
     await session.delete(db_category)
     await session.commit()
+    caches.category_cache.remove(category_id)
 
     return dict(message="Delete category success")
\ No newline at end of file
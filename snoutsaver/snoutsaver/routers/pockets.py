@@ -1,19 +1,70 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Header, Response, status
 
 from typing import List, Optional,Annotated
 from sqlmodel import Field, SQLModel, select, func, Session
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+import datetime
+import uuid
+
 
 from .. import models
 from .. import deps
+from .. import pagination
+from .. import ledger
+from .. import etags
+from .. import responses
 
 router = APIRouter(tags=["Pocket"], prefix="/pockets")
 
+
+POCKET_COLUMNS = responses.columns_for(models.AllPocket, models.DBPocket)
+
+
+async def with_balances(session: AsyncSession, pockets: dict) -> models.PocketList:
+    # Rows carry the opening balance, the page shows the current one
+    items = responses.models_from_rows(models.AllPocket, pockets["items"])
+    balances = await ledger.get_balances(session, [pocket.id for pocket in items])
+    for pocket in items:
+        pocket.balance = balances[pocket.id]
+
+    return models.PocketList.model_construct(**{**pockets, "items": items})
+
+
+async def pockets_etag(session: AsyncSession, user_id: int, page: pagination.Page) -> str:
+    # Pockets are only ever added and balances only change through new
+    # ledger entries, so the newest ids identify the state of the list
+    last_entry_id = (
+        select(func.max(models.DBPocketLedgerEntry.id))
+        .where(models.DBPocketLedgerEntry.user_id == user_id)
+        .scalar_subquery()
+    )
+    result = await session.exec(
+        select(func.count(models.DBPocket.id), func.max(models.DBPocket.id), last_entry_id)
+        .where(models.DBPocket.user_id == user_id)
+    )
+    return etags.make_etag("pockets", user_id, *result.one(), page.page, page.size_per_page)
+
+
+async def get_user_pocket(
+    session: AsyncSession, pocket_id: int, user_id: int
+) -> models.DBPocket:
+    db_pocket = await session.get(models.DBPocket, pocket_id)
+    if not db_pocket:
+        raise HTTPException(status_code=404, detail="Pocket not found")
+
+    if db_pocket.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User not authorized"
+        )
+
+    return db_pocket
+
 @router.post("")
 async def create_pocket(
     pocket: models.PocketCreate,
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.PocketCreate:
     
@@ -34,23 +85,29 @@ async def create_pocket(
 # Route to get all pockets
 @router.get("")
 async def get_all_pockets(
+    page: Annotated[pagination.Page, Depends(pagination.get_page)],
     session: AsyncSession = Depends(models.get_session),
 ) -> models.PocketList:
 
     print("get_all_pockets")
     
-    result = await session.execute(select(models.DBPocket))
-    pockets = result.scalars().all()
-
-    return models.PocketList.model_validate(
-        dict(items=pockets, page_size=0, page=0, size_per_page=0)
+    pockets = await pagination.paginate(
+        session,
+        select(*POCKET_COLUMNS).order_by(models.DBPocket.id),
+        page,
+        estimate_table=models.DBPocket.__tablename__,
     )
 
+    return responses.model_response(await with_balances(session, pockets))
+
 # Route to get all pockets by user_id
 @router.get("/{user_id}")
 async def get_all_pockets_id(
     user_id: int,
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    page: Annotated[pagination.Page, Depends(pagination.get_page)],
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
     session: AsyncSession = Depends(models.get_session),
 ) -> models.PocketList:
     
@@ -75,50 +132,158 @@ async def get_all_pockets_id(
             detail="User not authorized"
         )
     
-    db_pocket = await session.exec(
-        select(models.DBPocket).where(models.DBPocket.user_id == user_id)
+    etag = await pockets_etag(session, user_id, page)
+    if etags.etag_matches(if_none_match, etag):
+        return etags.not_modified(etag)
+
+    response.headers["ETag"] = etag
+    db_pocket = await pagination.paginate(
+        session,
+        select(*POCKET_COLUMNS)
+        .where(models.DBPocket.user_id == user_id)
+        .order_by(models.DBPocket.id),
+        page,
     )
-    db_pocket = db_pocket.all()
 
-    return models.PocketList(
-        items=db_pocket,
-        page_size=0,
-        page=0,
-        size_per_page=0
+    return responses.model_response(await with_balances(session, db_pocket), response)
+
+
+async def apply_transfers(
+    session: AsyncSession, user_id: int, transfers: list[models.PocketTransfer]
+) -> dict[int, float]:
+    # every leg is validated before the first one runs
+    if any(transfer.from_pocket_id == transfer.to_pocket_id for transfer in transfers):
+        raise HTTPException(status_code=400, detail="Cannot transfer to the same pocket")
+
+    pocket_ids = {transfer.from_pocket_id for transfer in transfers} | {
+        transfer.to_pocket_id for transfer in transfers
+    }
+
+    result = await session.exec(
+        select(models.DBPocket.id, models.DBPocket.user_id)
+        .where(models.DBPocket.id.in_(pocket_ids))
     )
+    owners = dict(result.all())
+
+    if len(owners) != len(pocket_ids):
+        raise HTTPException(status_code=404, detail="One or both pockets not found")
+
+    # Check if user is authorized
+    if any(owner != user_id for owner in owners.values()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User not authorized"
+        )
+
+    await ledger.lock_pockets(session, {transfer.from_pocket_id for transfer in transfers})
+
+    # every leg of a batch shares one transfer id
+    transfer_id = uuid.uuid4().hex
+    for transfer in transfers:
+        transferred = await ledger.transfer(
+            session,
+            user_id,
+            transfer.from_pocket_id,
+            transfer.to_pocket_id,
+            transfer.amount,
+            transfer_id=transfer_id,
+        )
+        if not transferred:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail="Insufficient funds in the source pocket")
+
+    balances = await ledger.get_balances(session, pocket_ids)
+    await session.commit()
+    return balances
 
 
 # Route to transfer balance between pockets
 @router.post("/transfer")
 async def transfer_balance(
     transfer: models.PocketTransfer, 
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: AsyncSession = Depends(models.get_session)
 ):
-    query_from = select(models.DBPocket).where(models.DBPocket.id == transfer.from_pocket_id)
-    query_to = select(models.DBPocket).where(models.DBPocket.id == transfer.to_pocket_id)
+    balances = await apply_transfers(session, current_user.id, [transfer])
 
-    from_pocket = (await session.execute(query_from)).scalar_one_or_none()
-    to_pocket = (await session.execute(query_to)).scalar_one_or_none()
+    return {
+        "message": "Transfer successful",
+        "from_pocket_balance": balances[transfer.from_pocket_id],
+        "to_pocket_balance": balances[transfer.to_pocket_id],
+    }
 
-    # Check if user is authorized
-    if from_pocket.user_id != current_user.id or to_pocket.user_id != current_user.id:
-         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User not authorized"
-        )
 
-    if not from_pocket or not to_pocket:
-        raise HTTPException(status_code=404, detail="One or both pockets not found")
+# Route to run several transfers in one transaction
+@router.post("/transfer/batch")
+async def transfer_balance_batch(
+    batch: models.PocketTransferBatch,
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: AsyncSession = Depends(models.get_session)
+) -> models.PocketTransferBatchResult:
+    balances = await apply_transfers(session, current_user.id, batch.transfers)
 
-    if from_pocket.balance < transfer.amount:
-        raise HTTPException(status_code=400, detail="Insufficient funds in the source pocket")
+    return models.PocketTransferBatchResult(message="Transfer successful", balances=balances)
 
-    from_pocket.balance -= transfer.amount
-    to_pocket.balance += transfer.amount
 
-    session.add(from_pocket)
-    session.add(to_pocket)
+# Route to add a correcting entry to a pocket
+@router.post("/{pocket_id}/adjustments")
+async def adjust_balance(
+    pocket_id: int,
+    adjustment: models.PocketAdjustment,
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: AsyncSession = Depends(models.get_session)
+) -> models.PocketBalance:
+    await get_user_pocket(session, pocket_id, current_user.id)
+
+    await ledger.append(
+        session,
+        [
+            ledger.entry_row(
+                pocket_id,
+                current_user.id,
+                adjustment.amount,
+                "adjustment",
+                description=adjustment.description,
+            )
+        ],
+    )
+    balances = await ledger.get_balances(session, [pocket_id])
     await session.commit()
 
-    return {"message": "Transfer successful", "from_pocket_balance": from_pocket.balance, "to_pocket_balance": to_pocket.balance}
+    return models.PocketBalance(pocket_id=pocket_id, balance=balances[pocket_id])
+
+
+# Route to get the balance of a pocket, now or at a point in time
+@router.get("/{pocket_id}/balance")
+async def read_balance(
+    pocket_id: int,
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    at: Optional[datetime.datetime] = None,
+    session: AsyncSession = Depends(models.get_session)
+) -> models.PocketBalance:
+    await get_user_pocket(session, pocket_id, current_user.id)
+
+    balances = await ledger.get_balances(session, [pocket_id], at)
+
+    return models.PocketBalance(pocket_id=pocket_id, balance=balances[pocket_id], at=at)
+
+
+# Route to list the ledger entries of a pocket, newest first
+@router.get("/{pocket_id}/ledger")
+async def read_ledger(
+    pocket_id: int,
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    page: Annotated[pagination.Page, Depends(pagination.get_page)],
+    session: AsyncSession = Depends(models.get_session)
+) -> models.LedgerEntryList:
+    await get_user_pocket(session, pocket_id, current_user.id)
+
+    entries = await pagination.paginate(
+        session,
+        select(models.DBPocketLedgerEntry)
+        .where(models.DBPocketLedgerEntry.pocket_id == pocket_id)
+        .order_by(models.DBPocketLedgerEntry.id.desc()),
+        page,
+    )
+
+    return models.LedgerEntryList.model_validate(entries)
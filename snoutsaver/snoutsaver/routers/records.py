@@ -1,68 +1,338 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 
-from typing import Optional,Annotated
-from sqlmodel import Field, SQLModel, select, func, Session
+from typing import Optional, Annotated, Literal
+from sqlmodel import Field, SQLModel, select, func, Session, tuple_
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+import base64
+import binascii
+import csv
+import datetime
+import io
+
 from .. import models
 from .. import deps
+from .. import caches
+from .. import rollups
+from .. import ledger
+from .. import etags
+from .. import responses
 
 router = APIRouter(tags=["Record"], prefix="/records")
 
 
+def encode_cursor(record: models.Records) -> str:
+    value = f"{record.record_date.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        record_date, record_id = value.split("|")
+        return datetime.datetime.fromisoformat(record_date), int(record_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Filters shared by the record list endpoints
+async def record_filters(
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None,
+    type: Optional[str] = None,
+    category_id: Optional[int] = None,
+    pocket_id: Optional[int] = None,
+) -> list:
+    filters = []
+    if start_date is not None:
+        filters.append(models.DBRecord.record_date >= start_date)
+    if end_date is not None:
+        filters.append(models.DBRecord.record_date < end_date)
+    if type is not None:
+        filters.append(models.DBRecord.type == type)
+    if category_id is not None:
+        filters.append(models.DBRecord.category_id == category_id)
+    if pocket_id is not None:
+        filters.append(models.DBRecord.pocket_id == pocket_id)
+    return filters
+
+
+async def get_pocket_owners(session: AsyncSession, pocket_ids) -> dict[int, int]:
+    # pocket id -> owner, for every referenced pocket in one query
+    pocket_ids = {pocket_id for pocket_id in pocket_ids if pocket_id is not None}
+    if not pocket_ids:
+        return {}
+
+    result = await session.exec(
+        select(models.DBPocket.id, models.DBPocket.user_id)
+        .where(models.DBPocket.id.in_(pocket_ids))
+    )
+    return dict(result.all())
+
+
 # Create
 @router.post("")
 async def create_record(
     record: models.CreateRecord,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
     ) -> models.Records | None:
     db_record = models.DBRecord.model_validate(record)
 
-    category = await session.exec(
-        select(models.DBCategory).where(models.DBCategory.id == record.category_id) 
-    )
-    category = category.one_or_none()
+    category = await caches.category_cache.get(session, record.category_id)
 
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+
+    if record.pocket_id is not None:
+        owners = await get_pocket_owners(session, [record.pocket_id])
+        if record.pocket_id not in owners:
+            raise HTTPException(status_code=404, detail="Pocket not found")
+        if owners[record.pocket_id] != current_user.id:
+            raise HTTPException(status_code=403, detail="User not authorized")
     
-    db_record.user = current_user
-    db_record.category = category
+    db_record.user_id = current_user.id
+    db_record.category_id = category.id
     db_record.category_name = category.name
-    db_record.record_date = record.record_date
+    db_record.record_date = record.record_date or datetime.datetime.now()
 
     session.add(db_record)
+    await session.flush()
+    await rollups.apply(session, rollups.records_delta([db_record]))
+    await ledger.append(session, ledger.record_entries([db_record]))
     await session.commit()
     await session.refresh(db_record)
 
     return models.Records.model_validate(db_record)
 
+# Create many
+@router.post("/bulk")
+async def create_records_bulk(
+    bulk: models.BulkCreateRecord,
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    ) -> models.BulkRecordResponse:
+
+    categories = await caches.category_cache.get_many(
+        session, [record.category_id for record in bulk.records]
+    )
+    owners = await get_pocket_owners(session, [record.pocket_id for record in bulk.records])
+
+    results = []
+    rows = []
+    for index, record in enumerate(bulk.records):
+        category = categories.get(record.category_id)
+        if not category:
+            results.append(
+                models.BulkRecordResult(index=index, status="error", detail="Category not found")
+            )
+            continue
+
+        if record.pocket_id is not None:
+            if record.pocket_id not in owners:
+                results.append(
+                    models.BulkRecordResult(index=index, status="error", detail="Pocket not found")
+                )
+                continue
+            if owners[record.pocket_id] != current_user.id:
+                results.append(
+                    models.BulkRecordResult(index=index, status="error", detail="User not authorized")
+                )
+                continue
+
+        rows.append(
+            dict(
+                user_id=current_user.id,
+                description=record.description,
+                amount=record.amount,
+                currency=record.currency,
+                type=record.type,
+                category_id=category.id,
+                category_name=category.name,
+                pocket_id=record.pocket_id,
+                record_date=record.record_date or datetime.datetime.now(),
+                is_monthly=False,
+            )
+        )
+        results.append(models.BulkRecordResult(index=index, status="created"))
+
+    # One executemany INSERT ... RETURNING for every valid item
+    if rows:
+        ids = await models.insert_returning_ids(session, models.DBRecord, rows)
+        created = iter(ids)
+        for result in results:
+            if result.status == "created":
+                result.id = next(created)
+
+        db_records = [models.DBRecord(**row, id=record_id) for row, record_id in zip(rows, ids)]
+        await rollups.apply(session, rollups.records_delta(db_records))
+        await ledger.append(session, ledger.record_entries(db_records))
+        await session.commit()
+
+    return models.BulkRecordResponse(
+        created=len(rows),
+        failed=len(results) - len(rows),
+        results=results,
+    )
+
 # Read 
 @router.get("")
 async def read_all_records(
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
-    session: Annotated[AsyncSession, Depends(models.get_session)]
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    filters: Annotated[list, Depends(record_filters)],
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
 ) -> models.RecordList:
     
+    statement = select(*responses.columns_for(models.Records, models.DBRecord)).where(
+        models.DBRecord.user_id == current_user.id, *filters
+    )
+
+    # Newest first; the cursor is the (record_date, id) of the last row seen
+    if cursor:
+        record_date, record_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(models.DBRecord.record_date, models.DBRecord.id)
+            < tuple_(record_date, record_id)
+        )
+
     result = await session.exec(
-        select(models.DBRecord).where(models.DBRecord.user_id == current_user.id)
+        statement.order_by(
+            models.DBRecord.record_date.desc(), models.DBRecord.id.desc()
+        ).limit(limit + 1)
     )
-    records = result.all()
+    records = responses.models_from_rows(models.Records, result.all())
 
-    if not records:
-        raise HTTPException(status_code=404, detail="Record not found")
-    
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1])
+
+    return responses.model_response(
+        models.RecordList.model_construct(records=records, next_cursor=next_cursor)
+    )
+
+# Summary
+@router.get("/summary")
+async def read_records_summary(
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None,
+    pocket_id: Optional[int] = None,
+) -> models.RecordSummary:
+
+    # The rollup table has no pocket dimension and whole-month granularity,
+    # anything finer is grouped from the records table instead.
+    if pocket_id is None and rollups.is_month_start(start_date) and rollups.is_month_start(end_date):
+        rollup = models.DBRecordRollup
+        statement = select(
+            rollup.month,
+            rollup.type,
+            rollup.category_id,
+            rollup.category_name,
+            rollup.total,
+            rollup.count,
+        ).where(rollup.user_id == current_user.id, rollup.count > 0)
+        if start_date is not None:
+            statement = statement.where(rollup.month >= start_date.strftime("%Y-%m"))
+        if end_date is not None:
+            statement = statement.where(rollup.month < end_date.strftime("%Y-%m"))
+        statement = statement.order_by(rollup.month, rollup.type, rollup.category_id)
+
+    else:
+        filters = await record_filters(
+            start_date=start_date, end_date=end_date, pocket_id=pocket_id
+        )
+        month = rollups.month_of(models.DBRecord.record_date, session.bind.dialect.name).label("month")
+        statement = (
+            select(
+                month,
+                models.DBRecord.type,
+                models.DBRecord.category_id,
+                func.max(models.DBRecord.category_name).label("category_name"),
+                func.sum(models.DBRecord.amount).label("total"),
+                func.count(models.DBRecord.id).label("count"),
+            )
+            .where(models.DBRecord.user_id == current_user.id, *filters)
+            .group_by(month, models.DBRecord.type, models.DBRecord.category_id)
+            .order_by(month, models.DBRecord.type, models.DBRecord.category_id)
+        )
+
+    result = await session.exec(statement)
+
+    return models.RecordSummary(
+        items=[models.MonthlySummary.model_validate(dict(row._mapping)) for row in result.all()]
+    )
+
+
+EXPORT_COLUMNS = list(models.Records.model_fields)
+EXPORT_BATCH_SIZE = 500
 
-    return models.RecordList.model_validate(
-        dict(records=records)
+
+def export_csv_rows(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            [
+                value.isoformat() if isinstance(value, datetime.datetime) else value
+                for value in (row[column] for column in EXPORT_COLUMNS)
+            ]
+        )
+    return buffer.getvalue()
+
+
+def export_ndjson_rows(rows) -> str:
+    return "".join(
+        models.Records.model_validate(dict(row)).model_dump_json() + "\n"
+        for row in rows
+    )
+
+
+# Export
+@router.get("/export")
+async def export_records(
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
+    filters: Annotated[list, Depends(record_filters)],
+    format: Literal["csv", "ndjson"] = "csv",
+) -> StreamingResponse:
+
+    statement = (
+        select(*[getattr(models.DBRecord, column) for column in EXPORT_COLUMNS])
+        .where(models.DBRecord.user_id == current_user.id, *filters)
+        .order_by(models.DBRecord.record_date, models.DBRecord.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    # The request's session is closed before the body is sent, so the
+    # generator opens its own and streams rows from a server-side cursor.
+    async def content():
+        if format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+        async for session in models.get_session():
+            result = await session.stream(statement)
+            async for rows in result.mappings().partitions():
+                if format == "csv":
+                    yield export_csv_rows(rows)
+                else:
+                    yield export_ndjson_rows(rows)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        content(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=records.{format}"},
     )
 
 # Read record by ID
 @router.get("/{record_id}")
 async def read_record(
     record_id: int,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)]
     ) -> models.Records:
     
@@ -80,7 +350,7 @@ async def read_record(
 async def update_record(
     record_id: int,
     record: models.UpdatedRecord,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)], 
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)], 
     session: Annotated[AsyncSession, Depends(models.get_session)]
     ) -> models.Records:
     
@@ -93,23 +363,32 @@ async def update_record(
     if db_record.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="User not authorized")
     
-    category = await session.exec(
-        select(models.DBCategory).where(models.DBCategory.id == record.category_id) 
-    )
-    category = category.one_or_none()
+    category = await caches.category_cache.get(session, record.category_id)
 
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    db_record.user = current_user
-    db_record.category = category
+    deltas = rollups.records_delta([db_record], sign=-1)
+    entries = ledger.record_entries([db_record], sign=-1)
+    amount = db_record.amount
+
+    db_record.user_id = current_user.id
+    db_record.category_id = category.id
     db_record.amount = record.amount
     db_record.currency = record.currency
     db_record.category_name = category.name
-    db_record.record_date = record.record_date
+    db_record.record_date = record.record_date or db_record.record_date
+
+    rollups.add_record(deltas, db_record)
 
     # db_record.sqlmodel_update(data)
     session.add(db_record)
+    await rollups.apply(session, deltas)
+    # the ledger is append-only, a new amount reverses the old entry
+    if db_record.amount != amount:
+        await ledger.append(session, entries + ledger.record_entries([db_record]))
+    if db_record.setup_id is not None:
+        await etags.bump_version(session, current_user.id, etags.SETUPS_RESOURCE)
     await session.commit()
     await session.refresh(db_record)
 
@@ -119,7 +398,7 @@ async def update_record(
 @router.delete("/{record_id}")
 async def delete_record(
     record_id: int,
-    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)]
     ) -> dict:
 
@@ -132,6 +411,10 @@ async def delete_record(
         raise HTTPException(status_code=403, detail="User not authorized")
     
     await session.delete(db_record)
+    await rollups.apply(session, rollups.records_delta([db_record], sign=-1))
+    await ledger.append(session, ledger.record_entries([db_record], sign=-1))
+    if db_record.setup_id is not None:
+        await etags.bump_version(session, current_user.id, etags.SETUPS_RESOURCE)
     await session.commit()
 
     return dict(message="Delete record success")
@@ -1,18 +1,54 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from typing import Annotated
 from sqlmodel import select
+from sqlalchemy import update, delete
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .. import models
 from .. import deps
+from .. import caches
+from .. import rollups
+from .. import etags
 from sqlalchemy.orm import selectinload
 
 router = APIRouter(tags=["Setup"], prefix="/setups")
 
+async def get_expense_categories(
+    session: AsyncSession, monthly_expenses: list[dict]
+) -> dict[int, models.Category]:
+    # every referenced category in one lookup instead of one per expense
+    categories = await caches.category_cache.get_many(
+        session, [int(expense["category_id"]) for expense in monthly_expenses]
+    )
+
+    for expense in monthly_expenses:
+        if int(expense["category_id"]) not in categories:
+            raise HTTPException(status_code=404, detail=f"Category not found for ID {expense['category_id']}")
+
+    return categories
+
+async def insert_records(session: AsyncSession, db_records: list[models.DBRecord]):
+    if not db_records:
+        return
+
+    ids = await models.insert_returning_ids(
+        session,
+        models.DBRecord,
+        [db_record.model_dump(exclude={"id"}) for db_record in db_records],
+    )
+    for db_record, record_id in zip(db_records, ids):
+        db_record.id = record_id
+
+def setup_response(db_setup: models.DBSetup, monthly_expenses: list[dict]) -> models.Setups:
+    return models.Setups.model_validate({
+        **db_setup.dict(),
+        "monthly_expenses": monthly_expenses
+    })
+
 # Create
 @router.post("")
 async def create_setups(
     setup: models.CreateSetup,
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.Setups:
 
@@ -25,6 +61,9 @@ async def create_setups(
     if existing_setup:
         raise HTTPException(status_code=400, detail="Setup already exists")
 
+    monthly_expenses = setup.monthly_expenses or []
+    categories = await get_expense_categories(session, monthly_expenses)
+
     db_setup = models.DBSetup(
         user_id=current_user.id,
         monthly_income=setup.monthly_income,
@@ -35,43 +74,36 @@ async def create_setups(
     session.add(db_setup)
     await session.flush()
 
+    new_records = []
+
     # Create monthly income record
     if setup.monthly_income:
-        category = await session.exec(
-            select(models.DBCategory).where(models.DBCategory.name == "Salary")
-        )
-        category = category.one_or_none()
+        category = await caches.category_cache.get_by_name(session, "Salary", "Income")
 
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
 
-        db_income = models.DBRecord(
-            pocket_id=1,
-            user_id=current_user.id,
-            amount=setup.monthly_income,
-            currency="THB",
-            type="Income",
-            description="Monthly Income",
-            category_id=category.id,
-            category_name=category.name,
-            is_monthly=True,
-            setup_id=db_setup.id
+        new_records.append(
+            models.DBRecord(
+                pocket_id=1,
+                user_id=current_user.id,
+                amount=setup.monthly_income,
+                currency="THB",
+                type="Income",
+                description="Monthly Income",
+                category_id=category.id,
+                category_name=category.name,
+                is_monthly=True,
+                setup_id=db_setup.id
+            )
         )
 
-        session.add(db_income)
-
     # Create monthly expenses records
-    if setup.monthly_expenses:
-        for expense_record in setup.monthly_expenses:
-            category = await session.exec(
-                select(models.DBCategory).where(models.DBCategory.id == int(expense_record["category_id"]))
-            )
-            category = category.one_or_none()
-
-            if not category:
-                raise HTTPException(status_code=404, detail="Category not found")
-
-            db_expense = models.DBRecord(
+    db_expenses = []
+    for expense_record in monthly_expenses:
+        category = categories[int(expense_record["category_id"])]
+        db_expenses.append(
+            models.DBRecord(
                 pocket_id=1,
                 user_id=current_user.id,
                 amount=expense_record["amount"],
@@ -83,36 +115,30 @@ async def create_setups(
                 is_monthly=True,
                 setup_id=db_setup.id
             )
+        )
+    new_records.extend(db_expenses)
 
-            session.add(db_expense)
-
+    await insert_records(session, new_records)
+    await rollups.apply(session, rollups.records_delta(new_records))
+    await etags.bump_version(session, current_user.id, etags.SETUPS_RESOURCE)
     await session.commit()
 
-    setup_result = await session.exec(
-        select(models.DBSetup)
-        .options(selectinload(models.DBSetup.monthly_expenses))
-        .where(models.DBSetup.id == db_setup.id)
-    )
-    db_setup = setup_result.one_or_none()
-
-    monthly_expenses = [
-        expense.dict() for expense in db_setup.monthly_expenses
-        if expense.type == "Expense"
-    ]
-
-    setup_data = models.Setups.model_validate({
-        **db_setup.dict(),
-        "monthly_expenses": monthly_expenses
-    })
-
-    return setup_data
+    return setup_response(db_setup, [expense.dict() for expense in db_expenses])
 
 # Read
 @router.get("")
 async def read_setups(
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
 ) -> models.Setups:
+
+    # compared before the setup and its records are loaded
+    version = await etags.get_version(session, current_user.id, etags.SETUPS_RESOURCE)
+    etag = etags.make_etag(etags.SETUPS_RESOURCE, current_user.id, version)
+    if etags.etag_matches(if_none_match, etag):
+        return etags.not_modified(etag)
     
     setup_result = await session.exec(
         select(models.DBSetup)
@@ -129,21 +155,18 @@ async def read_setups(
         if expense.type == "Expense"
     ]
 
-    setup_data = models.Setups.model_validate({
-        **db_setup.dict(),
-        "monthly_expenses": monthly_expenses
-    })
-
-    return setup_data
+    response.headers["ETag"] = etag
+    return setup_response(db_setup, monthly_expenses)
 
 # Update
 @router.put("")
 async def update_setups(
     setup: models.UpdatedSetup,
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.Setups:
 
+    # monthly_expenses holds every record of the setup, income included
     setup_result = await session.exec(
         select(models.DBSetup)
         .options(selectinload(models.DBSetup.monthly_expenses))
@@ -154,6 +177,24 @@ async def update_setups(
     if not db_setup:
         raise HTTPException(status_code=404, detail="Setup not found")
 
+    existing_expenses_by_id = {
+        expense.id: expense for expense in db_setup.monthly_expenses
+        if expense.type == "Expense"
+    }
+    income_record = next(
+        (
+            record for record in db_setup.monthly_expenses
+            if record.type == "Income" and record.is_monthly
+        ),
+        None,
+    )
+
+    new_expense_records = [
+        expense_record for expense_record in setup.monthly_expenses or []
+        if expense_record.get("id") not in existing_expenses_by_id
+    ]
+    categories = await get_expense_categories(session, new_expense_records)
+
     if setup.monthly_income is not None:
         db_setup.monthly_income = setup.monthly_income
 
@@ -163,99 +204,114 @@ async def update_setups(
     if setup.year is not None:
         db_setup.year = setup.year
 
-    category = await session.exec(
-        select(models.DBCategory).where(models.DBCategory.name == "Salary")
-    )
-    category = category.one_or_none()
-
-    if not category:
-        raise HTTPException(status_code=404, detail="Category 'Salary' not found")
-
-    income_record = await session.exec(
-        select(models.DBRecord)
-        .where(models.DBRecord.setup_id == db_setup.id, models.DBRecord.type == "Income", models.DBRecord.is_monthly == True)
-    )
-    income_record = income_record.one_or_none()
+    deltas = {}
+    new_records = []
+    updated_rows = []
 
     if income_record:
-        income_record.amount = setup.monthly_income
-        income_record.description = "Monthly Income"
-    else:
-        db_income = models.DBRecord(
-            user_id=current_user.id,
-            amount=setup.monthly_income,
-            currency="THB",
-            type="Income",
-            description="Monthly Income",
-            category_id=category.id,
-            category_name=category.name,
-            is_monthly=True,
-            setup_id=db_setup.id
-        )
-
-        session.add(db_income)
+        amount = income_record.amount
+        if setup.monthly_income is not None:
+            rollups.add_record(deltas, income_record, sign=-1)
+            amount = setup.monthly_income
+            rollups.add_record(deltas, models.DBRecord(**{**income_record.dict(), "amount": amount}))
+        updated_rows.append(dict(id=income_record.id, amount=amount, description="Monthly Income"))
+    elif setup.monthly_income is not None:
+        category = await caches.category_cache.get_by_name(session, "Salary", "Income")
 
-    # Update monthly expenses records
-    existing_expenses_by_id = {expense.id: expense for expense in db_setup.monthly_expenses if expense.type == "Expense"}
-    
-    updated_expense_ids = set()
-
-    for expense_record in setup.monthly_expenses:
-        if "id" in expense_record and expense_record["id"] in existing_expenses_by_id:
-            # Update existing expense record
-            db_expense = existing_expenses_by_id[expense_record["id"]]
-            db_expense.amount = expense_record["amount"]
-            db_expense.description = expense_record.get("description", db_expense.description)
-            updated_expense_ids.add(expense_record["id"])
-        else:
-            # Add new expense record
-            category = await session.exec(
-                select(models.DBCategory).where(models.DBCategory.id == int(expense_record["category_id"]))
-            )
-            category = category.one_or_none()
-
-            if not category:
-                raise HTTPException(status_code=404, detail=f"Category not found for ID {expense_record['category_id']}")
+        if not category:
+            raise HTTPException(status_code=404, detail="Category 'Salary' not found")
 
-            db_expense = models.DBRecord(
+        new_records.append(
+            models.DBRecord(
                 user_id=current_user.id,
-                amount=expense_record["amount"],
+                amount=setup.monthly_income,
                 currency="THB",
-                type="Expense",
-                description=expense_record.get("description", "Monthly Expense"),
+                type="Income",
+                description="Monthly Income",
                 category_id=category.id,
                 category_name=category.name,
                 is_monthly=True,
                 setup_id=db_setup.id
             )
+        )
 
-            session.add(db_expense)
-            db_setup.monthly_expenses.append(db_expense)
+    # Without monthly_expenses in the payload the expenses are left as they are
+    if setup.monthly_expenses is None:
+        kept_expenses = list(existing_expenses_by_id.values())
+        monthly_expenses = [expense.dict() for expense in kept_expenses]
+        removed_expenses = []
+    else:
+        monthly_expenses = []
+        updated_expense_ids = set()
 
-    # Delete expenses that are not in the updated list
-    for expense_id, db_expense in existing_expenses_by_id.items():
-        if expense_id not in updated_expense_ids:
-            await session.delete(db_expense)
+        for expense_record in setup.monthly_expenses:
+            if expense_record.get("id") in existing_expenses_by_id:
+                # Update existing expense record
+                db_expense = existing_expenses_by_id[expense_record["id"]]
+                updated = models.DBRecord(**{
+                    **db_expense.dict(),
+                    "amount": expense_record["amount"],
+                    "description": expense_record.get("description", db_expense.description),
+                })
+                rollups.add_record(deltas, db_expense, sign=-1)
+                rollups.add_record(deltas, updated)
+                updated_rows.append(dict(id=updated.id, amount=updated.amount, description=updated.description))
+                updated_expense_ids.add(updated.id)
+                monthly_expenses.append(updated)
+            else:
+                # Add new expense record
+                category = categories[int(expense_record["category_id"])]
+                db_expense = models.DBRecord(
+                    user_id=current_user.id,
+                    amount=expense_record["amount"],
+                    currency="THB",
+                    type="Expense",
+                    description=expense_record.get("description", "Monthly Expense"),
+                    category_id=category.id,
+                    category_name=category.name,
+                    is_monthly=True,
+                    setup_id=db_setup.id
+                )
+                new_records.append(db_expense)
+                monthly_expenses.append(db_expense)
+
+        # Delete expenses that are not in the updated list
+        removed_expenses = [
+            db_expense for expense_id, db_expense in existing_expenses_by_id.items()
+            if expense_id not in updated_expense_ids
+        ]
+
+    # Set-based writes: one UPDATE by primary key, one INSERT and one DELETE
+    if updated_rows:
+        await session.execute(update(models.DBRecord), updated_rows)
+
+    await insert_records(session, new_records)
+    for db_record in new_records:
+        rollups.add_record(deltas, db_record)
+
+    if removed_expenses:
+        await session.execute(
+            delete(models.DBRecord).where(
+                models.DBRecord.id.in_([expense.id for expense in removed_expenses])
+            )
+        )
+        for db_expense in removed_expenses:
+            rollups.add_record(deltas, db_expense, sign=-1)
 
+    await rollups.apply(session, deltas)
+    await etags.bump_version(session, current_user.id, etags.SETUPS_RESOURCE)
     await session.commit()
 
-    monthly_expenses = [
-        expense.dict() for expense in db_setup.monthly_expenses
-        if expense.type == "Expense"
-    ]
-
-    setup_data = models.Setups.model_validate({
-        **db_setup.dict(),
-        "monthly_expenses": monthly_expenses
-    })
+    if setup.monthly_expenses is not None:
+        monthly_expenses = [expense.dict() for expense in monthly_expenses]
 
-    return setup_data
+    return setup_response(db_setup, monthly_expenses)
 
 # Delete
 @router.delete("")
 async def delete_setup(
     setup_id: int,
-    current_user: Annotated[models.DBUser, Depends(deps.get_current_user)],
+    current_user: Annotated[models.CurrentUser, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ):
     setup_result = await session.exec(
@@ -268,6 +324,7 @@ async def delete_setup(
         raise HTTPException(status_code=404, detail="Setup not found")
 
     await session.delete(setup_result)
+    await etags.bump_version(session, current_user.id, etags.SETUPS_RESOURCE)
     await session.commit()
 
     return {"detail": "Setup deleted successfully"}
\ No newline at end of file
@@ -2,11 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, status
 
 from typing import Annotated
 
-from sqlmodel import select
+import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, or_
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .. import models
 from .. import deps
+from .. import caches
+from .. import pagination
+from .. import responses
 
 router = APIRouter(tags=["User"], prefix="/users")
 
@@ -19,25 +26,26 @@ async def create_user(
 ) -> models.User:
     print("create_user", user_info)
     
-    user = await session.exec(
-        select(models.DBUser).where(models.DBUser.username == user_info.username)
-    )
-    user = user.one_or_none()
-
-    email = await session.exec(
-        select(models.DBUser).where(models.DBUser.email == user_info.email)
+    # one lookup for both uniqueness checks
+    existing = await session.exec(
+        select(models.DBUser.username, models.DBUser.email).where(
+            or_(
+                models.DBUser.username == user_info.username,
+                models.DBUser.email == user_info.email,
+            )
+        )
     )
-    email = email.one_or_none()
+    existing = existing.all()
 
     # Check if user already exists
-    if user:
+    if any(username == user_info.username for username, _ in existing):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already exists"
         )
     
     # Check if email already exists
-    if email:
+    if any(email == user_info.email for _, email in existing):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already exists"
@@ -60,7 +68,15 @@ async def create_user(
     user = models.DBUser.model_validate(user_info)
     await user.set_password(user_info.password)
     session.add(user)
-    await session.commit()
+    try:
+        await session.commit()
+    except IntegrityError:
+        # registered by a concurrent request after the check above
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already exists"
+        )
     await session.refresh(user)
     return user
 
@@ -68,31 +84,29 @@ async def create_user(
 # Get current user
 @router.get("/me")
 async def get_user_me(
-    session: Annotated[AsyncSession, Depends(models.get_session)],
-    current_user: models.GetUser = Depends(deps.get_current_user),
+    current_user: models.CurrentUser = Depends(deps.get_current_user),
 ) -> models.GetUser:
     print("current_user", current_user)
 
-    user = await session.exec(
-        select(models.DBUser).where(models.DBUser.username == current_user.username)
-    )
-    result = user.one_or_none()
-
-    return models.GetUser.model_validate(result)
+    return models.GetUser.model_validate(current_user)
 
 # Get All users
 @router.get("/")
 async def get_all_users(
-    session: Annotated[AsyncSession, Depends(models.get_session)]
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    page: Annotated[pagination.Page, Depends(pagination.get_page)],
 ) -> models.UserList:
     print("get_all_users")
 
-    result = await session.exec(select(models.DBUser))
-    users = result.all()
-
-    return models.UserList.model_validate(
-        dict(items=users, page_size=0, page=0, size_per_page=0)
+    users = await pagination.paginate(
+        session,
+        select(*responses.columns_for(models.GetUser, models.DBUser)).order_by(models.DBUser.id),
+        page,
+        estimate_table=models.DBUser.__tablename__,
     )
+    users["items"] = responses.models_from_rows(models.GetUser, users["items"])
+
+    return responses.model_response(models.UserList.model_construct(**users))
 
 
 # Change password
@@ -101,7 +115,7 @@ async def change_password (
     user_id: int,
     password_update: models.ChangePassword,
     session: Annotated[AsyncSession, Depends(models.get_session)],
-    current_user: models.User = Depends(deps.get_current_user)
+    current_user: models.CurrentUser = Depends(deps.get_current_user)
 ) -> models.User:
     print("change_password", password_update)
 
@@ -137,8 +151,13 @@ async def change_password (
     
     await db_user.set_password(password_update.new_password)
     session.add(db_user)
+    # refresh tokens issued with the old password stop working
+    await session.merge(
+        models.DBTokenRevocation(user_id=db_user.id, revoked_at=datetime.datetime.now())
+    )
     await session.commit()
     await session.refresh(db_user)
+    caches.invalidate_user(db_user.id)
     return db_user
 
 
@@ -148,7 +167,7 @@ async def update_user(
     user_id: int,
     user_update: models.UpdateUser,
     session: Annotated[AsyncSession, Depends(models.get_session)],
-    current_user: models.User = Depends(deps.get_current_user)
+    current_user: models.CurrentUser = Depends(deps.get_current_user)
 ) -> models.UpdateUser:
     print("update_user", user_update)
 
@@ -198,6 +217,7 @@ async def update_user(
     session.add(db_user)
     await session.commit()
     await session.refresh(db_user)
+    caches.invalidate_user(db_user.id)
     return db_user
 
 # Update Profile Picture
@@ -206,7 +226,7 @@ async def update_profile_picture(
     user_id: int,
     profile_picture_update: models.UpdateProfilePicture,
     session: Annotated[AsyncSession, Depends(models.get_session)],
-    current_user: models.User = Depends(deps.get_current_user)
+    current_user: models.CurrentUser = Depends(deps.get_current_user)
 ) -> models.UpdateProfilePicture:
     print("update_profile_picture", profile_picture_update)
 
@@ -230,6 +250,7 @@ async def update_profile_picture(
     session.add(db_user)
     await session.commit()
     await session.refresh(db_user)
+    caches.invalidate_user(db_user.id)
     return db_user
     
 
@@ -238,7 +259,7 @@ async def update_profile_picture(
 async def delete_user(
     user_id: int,
     session: Annotated[AsyncSession, Depends(models.get_session)],
-    current_user: models.User = Depends(deps.get_current_user)
+    current_user: models.CurrentUser = Depends(deps.get_current_user)
 ) -> dict:
     print("delete_user", user_id)
 
@@ -258,6 +279,13 @@ async def delete_user(
             detail="User not authorized"
         )
     
+    await session.execute(
+        delete(models.DBTokenRevocation).where(models.DBTokenRevocation.user_id == user_id)
+    )
+    await session.execute(
+        delete(models.DBRevokedToken).where(models.DBRevokedToken.user_id == user_id)
+    )
     await session.delete(db_user)
     await session.commit()
+    caches.invalidate_user(user_id)
     return dict(message="delete user success")
@@ -1,4 +1,6 @@
 import datetime
+import time
+import uuid
 from typing import Any, Union
 
 import jwt
@@ -8,6 +10,10 @@ from . import config
 
 ALGORITHM = "HS256"
 
+# "type" claim; a refresh token is only accepted by /token/refresh
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
 settings = config.get_settings()
 
 
@@ -19,7 +25,7 @@ def create_access_token(data: dict, expires_delta: datetime.timedelta | None = N
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": ACCESS_TOKEN})
 
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -33,6 +39,15 @@ def create_refresh_token(data: dict, expires_delta: datetime.timedelta | None =
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
             minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    # jti identifies the token when it is revoked by rotation, iat (with
+    # sub-second precision) is compared to the user's revocation time
+    to_encode.update(
+        {
+            "exp": expire,
+            "iat": time.time(),
+            "type": REFRESH_TOKEN,
+            "jti": uuid.uuid4().hex,
+        }
+    )
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
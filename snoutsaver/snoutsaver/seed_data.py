@@ -1,4 +1,5 @@
 from sqlmodel import select
+from sqlalchemy.dialects import postgresql, sqlite
 from . import models
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -21,20 +22,27 @@ DEFAULT_CATEGORIES = [
 ]
 
 async def seed_default_categories(session: AsyncSession):
-    for category_data in DEFAULT_CATEGORIES:
-        # Check if the category already exists
-        existing_category = await session.exec(
-            select(models.DBCategory).where(
-                models.DBCategory.name == category_data["name"],
-                models.DBCategory.type == category_data["type"]
-            )
+    # Fetch the existing defaults in one query and insert the missing ones
+    # in one statement
+    existing = await session.exec(
+        select(models.DBCategory.name, models.DBCategory.type).where(
+            models.DBCategory.name.in_({category["name"] for category in DEFAULT_CATEGORIES})
         )
-        existing_category = existing_category.one_or_none()
-        
-        if not existing_category:
-            # If it doesn't exist, create a new category
-            new_category = models.DBCategory(**category_data)
-            session.add(new_category)
-            print(f"Created category: {new_category.name}")
-    
-    await session.commit()
\ No newline at end of file
+    )
+    existing = set(existing.all())
+
+    missing = [
+        category_data for category_data in DEFAULT_CATEGORIES
+        if (category_data["name"], category_data["type"]) not in existing
+    ]
+    if missing:
+        # bootstrap() serializes workers; a category created through the API
+        # since the lookup above is skipped via ix_categories_name_type
+        if session.bind.dialect.name == "postgresql":
+            statement = postgresql.insert(models.DBCategory)
+        else:
+            statement = sqlite.insert(models.DBCategory)
+        await session.execute(statement.on_conflict_do_nothing(), missing)
+        print(f"Created categories: {', '.join(category['name'] for category in missing)}")
+
+    await session.commit()
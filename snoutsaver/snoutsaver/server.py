@@ -0,0 +1,24 @@
+import uvicorn
+
+from . import config
+
+
+def main():
+    settings = config.get_settings()
+
+    uvicorn.run(
+        "snoutsaver.main:create_app",
+        factory=True,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        backlog=settings.SERVER_BACKLOG,
+        access_log=settings.SERVER_ACCESS_LOG,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import asyncio
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
@@ -9,7 +9,7 @@ from httpx import AsyncClient, ASGITransport
 from typing import Any, Dict, Optional
 from pydantic_settings import SettingsConfigDict
 
-from snoutsaver import models, config, main, security
+from snoutsaver import models, config, main, security, querycount
 import pytest
 import pytest_asyncio
 
@@ -60,6 +60,19 @@ async def get_session() -> models.AsyncIterator[models.AsyncSession]:
     async with async_session() as session:
         yield session
 
+@pytest.fixture(name="query_budget")
+def query_budget_fixture():
+    # with query_budget(3): ... fails when the block runs more than 3 statements
+    @contextmanager
+    def query_budget(budget: int):
+        with querycount.count_queries() as counter:
+            yield counter
+        assert counter.count <= budget, (
+            f"{counter.count} queries, budget {budget}:\n" + "\n".join(counter.statements)
+        )
+
+    return query_budget
+
 # [User]------------------------------------------------------------
 
 # user1
@@ -91,6 +104,35 @@ async def example_user1(session: models.AsyncSession) -> models.DBUser:
     await session.refresh(user)
     return user
 
+# user2
+@pytest_asyncio.fixture(name="user2")
+async def example_user2(session: models.AsyncSession) -> models.DBUser:
+    password = "12345678"
+    username = "user2"
+
+    query = await session.exec(
+        models.select(models.DBUser).where(models.DBUser.username == username).limit(1)
+    )
+    user = query.one_or_none()
+    if user:
+        return user
+
+    user = models.DBUser(
+        username=username,
+        password=password,
+        confirm_password=password,
+        email="test2@test.com",
+        first_name="Firstname",
+        last_name="lastname",
+        last_login_date=datetime.datetime.now(tz=datetime.timezone.utc),
+    )
+
+    await user.set_password(password)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
 @pytest_asyncio.fixture(name="token_user1")
 async def oauth_token_user1(user1: models.DBUser) -> dict:
     settings = SettingsTesting()
@@ -169,6 +211,20 @@ async def example_category2(session: models.AsyncSession) -> models.DBCategory:
 
 # ----------------------------------------------------------------------
 
+# [Pocket]------------------------------------------------------------
+
+# A new pocket for every test; filtering records by it only returns the
+# records the test itself created
+@pytest_asyncio.fixture(name="pocket")
+async def example_pocket(session: models.AsyncSession, user1: models.DBUser) -> models.DBPocket:
+    pocket = models.DBPocket(user_id=user1.id, name="Test pocket", balance=0)
+    session.add(pocket)
+    await session.commit()
+    await session.refresh(pocket)
+    return pocket
+
+# ----------------------------------------------------------------------
+
 # [Record]------------------------------------------------------------
 @pytest_asyncio.fixture(name="record")
 async def example_record1(session: models.AsyncSession) -> models.DBRecord:
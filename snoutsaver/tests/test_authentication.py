@@ -0,0 +1,117 @@
+from httpx import AsyncClient
+import pytest
+
+from snoutsaver import models, hashing, security
+from snoutsaver.routers import authentication
+
+# Refresh issues a new access token without verifying a password
+@pytest.mark.asyncio
+async def test_refresh_token(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token,
+    query_budget, monkeypatch
+):
+    def no_hashing():
+        raise AssertionError("refresh must not hash passwords")
+
+    monkeypatch.setattr(hashing, "get_hasher", no_hashing)
+
+    with query_budget(2):
+        response = await client.post(
+            "/token/refresh", json={"refresh_token": token_user1.refresh_token}
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["refresh_token"] == token_user1.refresh_token
+
+    headers = {"Authorization": f"Bearer {data['access_token']}"}
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == user1.id
+
+# Access and refresh tokens are not interchangeable
+@pytest.mark.asyncio
+async def test_token_types(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"Bearer {token_user1.refresh_token}"}
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 401
+
+    response = await client.post(
+        "/token/refresh", json={"refresh_token": token_user1.access_token}
+    )
+    assert response.status_code == 401
+
+    response = await client.post("/token/refresh", json={"refresh_token": "invalid"})
+    assert response.status_code == 401
+
+# With rotation every refresh token can be used once
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(
+    client: AsyncClient, user1: models.DBUser, monkeypatch
+):
+    monkeypatch.setattr(authentication.settings, "REFRESH_TOKEN_ROTATION", True)
+    refresh_token = security.create_refresh_token(data={"sub": user1.id})
+
+    response = await client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    rotated = response.json()["refresh_token"]
+    assert rotated != refresh_token
+
+    # replaying the old token fails, the new one works
+    response = await client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+    response = await client.post("/token/refresh", json={"refresh_token": rotated})
+    assert response.status_code == 200
+
+    # a revoked token stays revoked when rotation is turned off again
+    monkeypatch.setattr(authentication.settings, "REFRESH_TOKEN_ROTATION", False)
+    response = await client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+# Changing the password or deleting the user stops earlier refresh tokens
+@pytest.mark.asyncio
+async def test_refresh_token_revoked(client: AsyncClient):
+    payload = {
+        "email": "refresh@test.com",
+        "username": "refresh-user",
+        "password": "12345678",
+        "confirm_password": "12345678",
+        "provider": "default",
+    }
+    response = await client.post("/users/create", json=payload)
+    assert response.status_code == 200
+    user_id = response.json()["id"]
+
+    async def login(password: str) -> dict:
+        response = await client.post(
+            "/token", data={"username": "refresh-user", "password": password}
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    token = await login("12345678")
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    response = await client.post("/token/refresh", json={"refresh_token": token["refresh_token"]})
+    assert response.status_code == 200
+
+    response = await client.put(
+        f"/users/{user_id}/change_password",
+        json={"current_password": "12345678", "new_password": "87654321"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = await client.post("/token/refresh", json={"refresh_token": token["refresh_token"]})
+    assert response.status_code == 401
+
+    token = await login("87654321")
+    response = await client.post("/token/refresh", json={"refresh_token": token["refresh_token"]})
+    assert response.status_code == 200
+
+    response = await client.delete(f"/users/{user_id}/delete", headers=headers)
+    assert response.status_code == 200
+    response = await client.post("/token/refresh", json={"refresh_token": token["refresh_token"]})
+    assert response.status_code == 401
@@ -1,7 +1,9 @@
 from httpx import AsyncClient
+from sqlalchemy import event
 import pytest
+import time
 
-from snoutsaver import models
+from snoutsaver import models, caches
 
 # Not Authenticated Create Category
 @pytest.mark.asyncio
@@ -215,4 +217,96 @@ async def test_delete_category(
     invalid_category_id = 999
     invalid_response = await client.delete(f"/categories/{invalid_category_id}", headers=headers)
     assert invalid_response.status_code == 404
-    assert invalid_response.json() == {"detail": "Category not found"}
\ No newline at end of file
+    assert invalid_response.json() == {"detail": "Category not found"}
+
+# Category Cache serves record writes
+@pytest.mark.asyncio
+async def test_category_cache_record_writes(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token, category2: models.DBCategory
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    record_data = {
+        "user_id": user1.id,
+        "description": "Cached category record",
+        "amount": 50.0,
+        "currency": "THB",
+        "type": "Expense",
+        "category_id": category2.id,
+        "category_name": category2.name,
+        "record_date": "2022-01-01"
+    }
+
+    caches.category_cache.clear()
+    response = await client.get("/categories", headers=headers)
+    assert response.status_code == 200
+
+    stats = caches.category_cache.stats()
+    for _ in range(3):
+        response = await client.post("/records", json=record_data, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["category_name"] == category2.name
+
+    assert caches.category_cache.hits == stats["hits"] + 3
+    assert caches.category_cache.misses == stats["misses"]
+
+# Expired Category Cache reloads once
+@pytest.mark.asyncio
+async def test_category_cache_reload_after_ttl(
+    session: models.AsyncSession, category2: models.DBCategory
+):
+    cache = caches.CategoryCache(ttl=1)
+    await cache.load(session)
+    cache._loaded_at = time.monotonic() - 10
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(models.engine.sync_engine, "before_cursor_execute", count)
+    try:
+        for _ in range(3):
+            category = await cache.get(session, category2.id)
+            assert category.name == category2.name
+        category = await cache.get_by_name(session, category2.name, category2.type)
+        assert category.id == category2.id
+    finally:
+        event.remove(models.engine.sync_engine, "before_cursor_execute", count)
+
+    assert len(statements) == 1
+    assert cache.misses == 1
+    assert cache.hits == 3
+
+# Unchanged categories are answered with 304
+@pytest.mark.asyncio
+async def test_categories_etag(
+    client: AsyncClient, token_user1: models.Token, category1: models.DBCategory
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    response = await client.get("/categories", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("private")
+
+    response = await client.get("/categories", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # compressed variants and weak validators match the same representation
+    gzip_etag = etag[:-1] + '-gzip"'
+    response = await client.get("/categories", headers={**headers, "If-None-Match": f'"other", W/{gzip_etag}'})
+    assert response.status_code == 304
+
+    response = await client.get(
+        "/categories", params={"size_per_page": 1}, headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+    response = await client.put(
+        f"/categories/{category1.id}", json={"name": category1.name, "type": category1.type, "icon": "etag_icon"}, headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/categories", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
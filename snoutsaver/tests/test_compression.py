@@ -0,0 +1,109 @@
+import gzip
+
+from httpx import AsyncClient
+import pytest
+
+from snoutsaver import models, compression
+
+
+async def create_records(
+    client: AsyncClient, headers: dict, user1: models.DBUser, category1: models.DBCategory, pocket: models.DBPocket
+):
+    # 100 records in the test's own pocket, listed and exported by pocket_id
+    payload = {
+        "records": [
+            {
+                "user_id": user1.id,
+                "description": f"Compressed record {index}",
+                "amount": 10 + index,
+                "currency": "THB",
+                "type": "Expense",
+                "category_id": category1.id,
+                "category_name": category1.name,
+                "pocket_id": pocket.id,
+                "record_date": f"2023-06-{1 + index % 28:02d}T00:00:00",
+            }
+            for index in range(100)
+        ]
+    }
+    response = await client.post("/records/bulk", json=payload, headers=headers)
+    assert response.status_code == 200
+
+# Large JSON is gzipped for clients that accept it
+@pytest.mark.asyncio
+async def test_gzip_response(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token,
+    category1: models.DBCategory, pocket: models.DBPocket
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await create_records(client, headers, user1, category1, pocket)
+    params = {"pocket_id": pocket.id, "limit": 100}
+
+    plain = await client.get("/records", params=params, headers={**headers, "Accept-Encoding": "identity"})
+    assert len(plain.json()["records"]) == 100
+    assert "content-encoding" not in plain.headers
+
+    response = await client.get("/records", params=params, headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(plain.content) / 3
+    assert response.json() == plain.json()
+
+    if compression.brotli is not None:
+        response = await client.get("/records", params=params, headers={**headers, "Accept-Encoding": "br"})
+        assert response.headers["content-encoding"] == "br"
+        assert int(response.headers["content-length"]) < len(plain.content) / 3
+        assert response.json() == plain.json()
+
+    # small bodies are not worth compressing
+    response = await client.get("/users/me", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+# Streaming exports are compressed chunk by chunk
+@pytest.mark.asyncio
+async def test_gzip_streaming_export(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token,
+    category1: models.DBCategory, pocket: models.DBPocket
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await create_records(client, headers, user1, category1, pocket)
+
+    params = {"format": "ndjson", "pocket_id": pocket.id}
+    headers = {**headers, "Accept-Encoding": "gzip"}
+    async with client.stream("GET", "/records/export", params=params, headers=headers) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert len(lines) == 100
+    assert all(line.startswith("{") for line in lines)
+
+# ETags of compressed bodies still validate
+@pytest.mark.asyncio
+async def test_compressed_etag(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token,
+    category1: models.DBCategory, monkeypatch
+):
+    # compress whatever the category list holds, however short it is
+    monkeypatch.setattr(compression.settings, "COMPRESSION_MINIMUM_SIZE", 0)
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}", "Accept-Encoding": "gzip"}
+    response = await client.get("/categories", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    response = await client.get("/categories", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_choose_encoding():
+    assert compression.choose_encoding("gzip, deflate") == "gzip"
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding("gzip;q=0") is None
+    assert compression.choose_encoding("") is None
+    if compression.brotli is not None:
+        assert compression.choose_encoding("gzip, br") == "br"
+        assert compression.choose_encoding("br;q=0.5, gzip") == "gzip"
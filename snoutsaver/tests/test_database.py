@@ -0,0 +1,191 @@
+import datetime
+
+from httpx import AsyncClient
+from sqlalchemy import delete, exc, or_, text
+from sqlalchemy.ext.asyncio import create_async_engine
+import pytest
+
+from snoutsaver import models, querycount, bootstrap, seed_data
+
+# Pool statistics follow checkouts
+@pytest.mark.asyncio
+async def test_pool_stats(
+    client: AsyncClient, user1: models.DBUser
+):
+    before = models.get_pool_stats()
+    response = await client.get("/users/", params={"size_per_page": 1})
+    assert response.status_code == 200
+
+    stats = models.get_pool_stats()
+    assert stats["checkouts"] > before["checkouts"]
+    assert stats["checkins"] > before["checkins"]
+    assert "checked_out" in stats and "overflow" in stats
+    assert stats["size"] == 5
+
+# Only an exhausted pool counts as a timeout, not a failing connect
+@pytest.mark.asyncio
+async def test_pool_timeouts():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///./test-data/test-pool.db",
+        poolclass=models.InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    before = models.pool_stats.timeouts
+    async with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            async with engine.connect():
+                pass
+    assert models.pool_stats.timeouts == before + 1
+    await engine.dispose()
+
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///./test-data/missing/test-pool.db",
+        poolclass=models.InstrumentedQueuePool,
+    )
+    with pytest.raises(exc.OperationalError):
+        async with engine.connect():
+            pass
+    assert models.pool_stats.timeouts == before + 1
+    await engine.dispose()
+
+# Debug mode reports the statements run per request
+@pytest.mark.asyncio
+async def test_query_count_headers(
+    client: AsyncClient, user1: models.DBUser, monkeypatch
+):
+    response = await client.get("/users/", params={"size_per_page": 1})
+    assert "x-db-query-count" not in response.headers
+
+    monkeypatch.setattr(querycount.settings, "DB_QUERY_HEADERS", True)
+    response = await client.get("/users/", params={"size_per_page": 1})
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == "2"
+    assert float(response.headers["x-db-query-time-ms"]) >= 0
+
+# Repeated statements are logged as a warning, not printed
+@pytest.mark.asyncio
+async def test_query_count_repeated_warning(
+    client: AsyncClient, user1: models.DBUser, monkeypatch, caplog
+):
+    monkeypatch.setattr(querycount.settings, "DB_QUERY_HEADERS", True)
+    monkeypatch.setattr(querycount.settings, "DB_QUERY_REPEAT_WARNING", 1)
+    with caplog.at_level("WARNING", logger="snoutsaver.querycount"):
+        response = await client.get("/users/", params={"size_per_page": 1})
+    assert response.status_code == 200
+    assert "repeated queries GET /users/" in caplog.text
+
+# A failing statement leaves no start time behind for the next one
+@pytest.mark.asyncio
+async def test_query_count_failed_statement(session: models.AsyncSession):
+    with querycount.count_queries() as counter:
+        with pytest.raises(exc.OperationalError):
+            await session.exec(text("SELECT * FROM missing_table"))
+        await session.rollback()
+        await session.exec(text("SELECT 1"))
+
+    assert counter.count == 1
+    assert counter.statements == ["SELECT 1"]
+    assert counter.seconds < 1
+
+# A bootstrapped database is recognised with one query
+@pytest.mark.asyncio
+async def test_bootstrap_version_marker(
+    session: models.AsyncSession, query_budget
+):
+    await bootstrap.bootstrap()
+
+    with query_budget(1):
+        assert await bootstrap.bootstrap() is False
+
+    # seeding again finds every default in one query and inserts nothing
+    with query_budget(1):
+        await seed_data.seed_default_categories(session)
+
+    result = await session.exec(
+        models.select(models.DBCategory.name, models.DBCategory.type)
+        .where(models.DBCategory.name.in_({"Salary", "Other"}))
+    )
+    assert sorted(result.all()) == [("Other", "Expense"), ("Other", "Income"), ("Salary", "Income")]
+
+# Records written before the rollups table existed are summed on bootstrap
+@pytest.mark.asyncio
+async def test_bootstrap_rebuilds_rollups(
+    session: models.AsyncSession, user1: models.DBUser, category1: models.DBCategory
+):
+    session.add(
+        models.DBRecord(
+            user_id=user1.id,
+            description="Before rollups",
+            amount=70,
+            currency="THB",
+            type="Expense",
+            category_id=category1.id,
+            category_name=category1.name,
+            record_date=datetime.datetime(2015, 3, 10),
+        )
+    )
+    # an upgraded database: no markers, no rollup rows
+    await session.execute(delete(models.DBBootstrapState))
+    await session.execute(delete(models.DBRecordRollup))
+    await session.commit()
+
+    assert await bootstrap.bootstrap() is True
+
+    rollup = models.DBRecordRollup
+    result = await session.exec(
+        models.select(rollup.total, rollup.count)
+        .where(rollup.user_id == user1.id, rollup.month == "2015-03")
+        .execution_options(populate_existing=True)
+    )
+    assert result.all() == [(70, 1)]
+    assert await session.get(models.DBBootstrapState, bootstrap.ROLLUPS_KEY) is not None
+
+# Lookups on hot paths, as the routers build them
+HOT_QUERIES = dict(
+    token_username=models.select(models.DBUser).where(models.DBUser.username == "user1"),
+    create_user=models.select(models.DBUser.username, models.DBUser.email).where(
+        or_(models.DBUser.username == "user1", models.DBUser.email == "user1@email.local")
+    ),
+    update_user_email=models.select(models.DBUser).where(models.DBUser.email == "user1@email.local"),
+    records_list=models.select(models.DBRecord)
+    .where(models.DBRecord.user_id == 1)
+    .order_by(models.DBRecord.record_date.desc(), models.DBRecord.id.desc())
+    .limit(51),
+    records_list_by_type=models.select(models.DBRecord)
+    .where(models.DBRecord.user_id == 1, models.DBRecord.type == "Expense")
+    .order_by(models.DBRecord.record_date.desc(), models.DBRecord.id.desc())
+    .limit(51),
+    setup_expenses=models.select(models.DBRecord).where(
+        models.DBRecord.setup_id.in_([1]),
+        models.DBRecord.type == "Expense",
+        models.DBRecord.is_monthly == True,
+    ),
+    setup_by_user=models.select(models.DBSetup).where(models.DBSetup.user_id == 1),
+    category_by_name=models.select(models.DBCategory).where(models.DBCategory.name == "Food"),
+    category_by_name_type=models.select(models.DBCategory).where(
+        models.DBCategory.name == "Food", models.DBCategory.type == "Expense"
+    ),
+    pockets_by_user=models.select(models.DBPocket)
+    .where(models.DBPocket.user_id == 1)
+    .order_by(models.DBPocket.id),
+    pocket_ledger=models.select(models.DBPocketLedgerEntry)
+    .where(models.DBPocketLedgerEntry.pocket_id == 1)
+    .order_by(models.DBPocketLedgerEntry.id.desc()),
+)
+
+# Hot lookups are served from an index, never a full table scan
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", HOT_QUERIES)
+async def test_hot_queries_use_indexes(
+    session: models.AsyncSession, name: str
+):
+    sql = HOT_QUERIES[name].compile(
+        dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    result = await session.exec(text(f"EXPLAIN QUERY PLAN {sql}"))
+    plan = [detail for _, _, _, detail in result.all()]
+
+    scans = [detail for detail in plan if detail.startswith("SCAN ")]
+    assert not scans, f"{name} scans a table:\n" + "\n".join(plan)
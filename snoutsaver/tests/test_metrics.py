@@ -0,0 +1,35 @@
+from httpx import AsyncClient
+import pytest
+
+from snoutsaver import models
+
+# Metrics use route templates as labels
+@pytest.mark.asyncio
+async def test_metrics(
+    client: AsyncClient, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await client.get("/categories/987654", headers=headers)
+    await client.get("/does-not-exist")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert 'snoutsaver_http_requests_total{method="GET",route="/categories/{category_id}",status="404"}' in body
+    assert 'snoutsaver_http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'snoutsaver_http_request_duration_seconds_bucket{method="GET",route="/categories/{category_id}",le="+Inf"}' in body
+    assert "987654" not in body
+    assert "snoutsaver_http_requests_in_flight 1" in body
+
+    # monotonic statistics are counters, point-in-time ones gauges
+    assert "# TYPE snoutsaver_db_pool_checkouts_total counter" in body
+    assert "# TYPE snoutsaver_db_pool_checked_out gauge" in body
+    assert "# TYPE snoutsaver_cache_hits_total counter" in body
+    assert 'snoutsaver_cache_hits_total{cache="category"}' in body
+    assert 'snoutsaver_cache_size{cache="token"}' in body
+
+    # every sample belongs to a declared snoutsaver_ family
+    for line in body.splitlines():
+        assert line.startswith(("# HELP snoutsaver_", "# TYPE snoutsaver_", "snoutsaver_"))
@@ -0,0 +1,266 @@
+import asyncio
+import random
+
+from httpx import AsyncClient
+import pytest
+
+from snoutsaver import models, ledger
+
+
+async def create_pocket(
+    client: AsyncClient, headers: dict, user_id: int, name: str, balance: float
+) -> int:
+    response = await client.post("/pockets", json={"name": name, "balance": balance}, headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get(f"/pockets/{user_id}", params={"size_per_page": 500}, headers=headers)
+    return max(pocket["id"] for pocket in response.json()["items"] if pocket["name"] == name)
+
+# Transfer checks ownership, existence and funds
+@pytest.mark.asyncio
+async def test_transfer_balance(
+    client: AsyncClient, session: models.AsyncSession, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    wallet = await create_pocket(client, headers, user1.id, "Transfer Wallet", 100)
+    savings = await create_pocket(client, headers, user1.id, "Transfer Savings", 0)
+
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": wallet, "to_pocket_id": savings, "amount": 40},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["from_pocket_balance"] == 60
+    assert response.json()["to_pocket_balance"] == 40
+
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": wallet, "to_pocket_id": savings, "amount": 61},
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": wallet, "to_pocket_id": 987654, "amount": 1},
+        headers=headers,
+    )
+    assert response.status_code == 404
+
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": wallet, "to_pocket_id": savings, "amount": -10},
+        headers=headers,
+    )
+    assert response.status_code == 422
+
+    other = models.DBPocket(user_id=user1.id + 1000, name="Not mine", balance=100)
+    session.add(other)
+    await session.commit()
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": other.id, "to_pocket_id": wallet, "amount": 1},
+        headers=headers,
+    )
+    assert response.status_code == 403
+
+# A batch either applies every leg or none of them
+@pytest.mark.asyncio
+async def test_transfer_batch(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    a = await create_pocket(client, headers, user1.id, "Batch A", 100)
+    b = await create_pocket(client, headers, user1.id, "Batch B", 0)
+    c = await create_pocket(client, headers, user1.id, "Batch C", 0)
+
+    response = await client.post(
+        "/pockets/transfer/batch",
+        json={"transfers": [
+            {"from_pocket_id": a, "to_pocket_id": b, "amount": 70},
+            {"from_pocket_id": b, "to_pocket_id": c, "amount": 30},
+        ]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["balances"] == {str(a): 30, str(b): 40, str(c): 30}
+
+    response = await client.post(
+        "/pockets/transfer/batch",
+        json={"transfers": [
+            {"from_pocket_id": a, "to_pocket_id": b, "amount": 30},
+            {"from_pocket_id": c, "to_pocket_id": a, "amount": 31},
+        ]},
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+    # a same-pocket leg fails the batch before any leg runs
+    response = await client.post(
+        "/pockets/transfer/batch",
+        json={"transfers": [
+            {"from_pocket_id": a, "to_pocket_id": b, "amount": 10},
+            {"from_pocket_id": c, "to_pocket_id": c, "amount": 5},
+        ]},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cannot transfer to the same pocket"
+
+    response = await client.get(f"/pockets/{user1.id}", params={"size_per_page": 500}, headers=headers)
+    balances = {pocket["id"]: pocket["balance"] for pocket in response.json()["items"]}
+    assert (balances[a], balances[b], balances[c]) == (30, 40, 30)
+
+# Parallel transfers never overdraw a pocket or lose an update
+@pytest.mark.asyncio
+async def test_transfer_concurrency(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    a = await create_pocket(client, headers, user1.id, "Stress A", 100)
+    b = await create_pocket(client, headers, user1.id, "Stress B", 100)
+
+    legs = [random.choice([(a, b), (b, a)]) for _ in range(60)]
+    responses = await asyncio.gather(*[
+        client.post(
+            "/pockets/transfer",
+            json={"from_pocket_id": from_id, "to_pocket_id": to_id, "amount": 30},
+            headers=headers,
+        )
+        for from_id, to_id in legs
+    ])
+    assert {response.status_code for response in responses} <= {200, 400}
+
+    expected = {a: 100, b: 100}
+    # the stored balances are exactly the successful legs applied
+    for (from_id, to_id), response in zip(legs, responses):
+        if response.status_code == 200:
+            expected[from_id] -= 30
+            expected[to_id] += 30
+
+    response = await client.get(f"/pockets/{user1.id}", params={"size_per_page": 500}, headers=headers)
+    balances = {pocket["id"]: pocket["balance"] for pocket in response.json()["items"]}
+    assert balances[a] == expected[a]
+    assert balances[b] == expected[b]
+    assert balances[a] >= 0 and balances[b] >= 0
+    assert balances[a] + balances[b] == 200
+
+# Balances are the opening balance plus the ledger, before and after compaction
+@pytest.mark.asyncio
+async def test_pocket_ledger(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    wallet = await create_pocket(client, headers, user1.id, "Ledger Wallet", 1000)
+    savings = await create_pocket(client, headers, user1.id, "Ledger Savings", 0)
+
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": wallet, "to_pocket_id": savings, "amount": 300},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    record = {
+        "user_id": user1.id,
+        "description": "Groceries",
+        "amount": 50,
+        "currency": "THB",
+        "type": "Expense",
+        "category_id": category1.id,
+        "category_name": category1.name,
+        "pocket_id": wallet,
+        "record_date": "2024-03-01T12:00:00",
+    }
+    response = await client.post("/records", json=record, headers=headers)
+    assert response.status_code == 200
+    record_id = response.json()["id"]
+
+    response = await client.put(f"/records/{record_id}", json={**record, "amount": 80}, headers=headers)
+    assert response.status_code == 200
+
+    response = await client.post(
+        f"/pockets/{wallet}/adjustments",
+        json={"amount": -20, "description": "Cash count"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["balance"] == 1000 - 300 - 80 - 20
+
+    response = await client.get(f"/pockets/{wallet}/ledger", headers=headers)
+    assert response.status_code == 200
+    entries = response.json()["items"]
+    assert [entry["kind"] for entry in entries] == ["adjustment", "record", "record", "record", "transfer"]
+    assert [entry["amount"] for entry in entries] == [-20, -80, 50, -50, -300]
+
+    # a snapshot changes nothing about the balance, later entries add to it
+    assert await ledger.compact(session, grace_seconds=0) > 0
+    # a second compactor finds nothing left to fold
+    assert await ledger.compact(session, grace_seconds=0) == 0
+    await client.post(f"/pockets/{wallet}/adjustments", json={"amount": 5}, headers=headers)
+
+    response = await client.get(f"/pockets/{user1.id}", params={"size_per_page": 500}, headers=headers)
+    balances = {pocket["id"]: pocket["balance"] for pocket in response.json()["items"]}
+    assert balances[wallet] == 1000 - 300 - 80 - 20 + 5
+    assert balances[savings] == 300
+
+    response = await client.delete(f"/records/{record_id}", headers=headers)
+    assert response.status_code == 200
+    response = await client.get(f"/pockets/{wallet}/balance", headers=headers)
+    assert response.json()["balance"] == 1000 - 300 - 20 + 5
+
+    response = await client.get(
+        f"/pockets/{wallet}/balance", params={"at": entries[-1]["created_at"]}, headers=headers
+    )
+    assert response.json()["balance"] == 700
+
+    response = await client.get(f"/pockets/{wallet + 1000}/balance", headers=headers)
+    assert response.status_code == 404
+
+# The pocket list returns every field of a pocket, with its current balance
+@pytest.mark.asyncio
+async def test_pockets_fields(
+    client: AsyncClient, session: models.AsyncSession, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    pocket_id = await create_pocket(client, headers, user1.id, "Fields Pocket", 50)
+    await client.post(f"/pockets/{pocket_id}/adjustments", json={"amount": 5}, headers=headers)
+
+    response = await client.get(f"/pockets/{user1.id}", params={"size_per_page": 500}, headers=headers)
+    item = next(item for item in response.json()["items"] if item["id"] == pocket_id)
+
+    db_pocket = await session.get(models.DBPocket, pocket_id)
+    expected = models.AllPocket.model_validate(db_pocket).model_dump(mode="json")
+    assert set(item) == set(models.AllPocket.model_fields)
+    assert item == {**expected, "balance": 55}
+
+# The pocket list ETag follows new pockets and ledger entries
+@pytest.mark.asyncio
+async def test_pockets_etag(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    a = await create_pocket(client, headers, user1.id, "ETag A", 100)
+    b = await create_pocket(client, headers, user1.id, "ETag B", 0)
+
+    response = await client.get(f"/pockets/{user1.id}", headers=headers)
+    etag = response.headers["etag"]
+
+    response = await client.get(f"/pockets/{user1.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.post(
+        "/pockets/transfer",
+        json={"from_pocket_id": a, "to_pocket_id": b, "amount": 10},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/pockets/{user1.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
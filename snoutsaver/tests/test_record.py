@@ -1,6 +1,8 @@
+import json
+
 import pytest
 from httpx import AsyncClient
-from snoutsaver import models
+from snoutsaver import models, rollups, ledger
 
 # Test Create Record with Authorization
 @pytest.mark.asyncio
@@ -69,6 +71,45 @@ async def test_read_all_records_with_auth(
     data = response.json()
     assert len(data["records"]) > 0
 
+# Test Read All Records returns every field of a record
+@pytest.mark.asyncio
+async def test_read_all_records_fields(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory):
+
+    pocket = models.DBPocket(user_id=user1.id, name="Fields Wallet", balance=0)
+    session.add(pocket)
+    await session.commit()
+    await session.refresh(pocket)
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    record_data = {
+        "user_id": user1.id,
+        "description": "Projected record",
+        "amount": 12.5,
+        "currency": "THB",
+        "type": "Expense",
+        "category_id": category1.id,
+        "category_name": "",
+        "pocket_id": pocket.id,
+        "record_date": "2021-07-01T08:30:00",
+    }
+    response = await client.post("/records", json=record_data, headers=headers)
+    assert response.status_code == 200
+    single = await client.get(f"/records/{response.json()['id']}", headers=headers)
+
+    # the list selects only some columns, a missing one would show up here
+    response = await client.get("/records", params={"pocket_id": pocket.id}, headers=headers)
+    assert response.status_code == 200
+    [item] = response.json()["records"]
+    assert set(item) == set(models.Records.model_fields)
+    assert item == single.json()
+    assert item["category_name"] == category1.name
+    assert item["pocket_id"] == pocket.id
+
 # Test Read All Records without Authorization
 @pytest.mark.asyncio
 async def test_read_all_records_without_auth(client: AsyncClient):
@@ -189,4 +230,274 @@ async def test_delete_record_with_auth(
 @pytest.mark.asyncio
 async def test_delete_record_without_auth(client: AsyncClient):
     response = await client.delete(f"/records/1")  # Using a random ID
-    assert response.status_code == 401  # Unauthorized
\ No newline at end of file
+    assert response.status_code == 401  # Unauthorized
+
+# Test Read All Records with keyset pagination and filters
+@pytest.mark.asyncio
+async def test_read_all_records_paginated(
+    client: AsyncClient,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory,
+    pocket: models.DBPocket):
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    for day in range(1, 6):
+        record_data = {
+            "user_id": user1.id,
+            "description": f"Paginated record {day}",
+            "amount": 10.0 * day,
+            "currency": "THB",
+            "type": "Expense",
+            "category_id": category1.id,
+            "category_name": category1.name,
+            "pocket_id": pocket.id,
+            "record_date": f"2019-01-0{day}"
+        }
+        response = await client.post("/records", json=record_data, headers=headers)
+        assert response.status_code == 200
+
+    # the test's own pocket keeps records from other tests out of the pages
+    params = {"start_date": "2019-01-01", "end_date": "2020-01-01", "pocket_id": pocket.id, "limit": 2}
+    descriptions = []
+    cursor = None
+    while True:
+        response = await client.get(
+            "/records", params=dict(params, **({"cursor": cursor} if cursor else {})), headers=headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["records"]) <= 2
+        descriptions += [record["description"] for record in data["records"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert descriptions == [f"Paginated record {day}" for day in range(5, 0, -1)]
+
+    # Empty result is not an error
+    response = await client.get(
+        "/records", params={"start_date": "2020-01-01", "pocket_id": pocket.id}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["records"] == []
+
+    # Invalid cursor
+    response = await client.get("/records", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+# Test Export Records as CSV and NDJSON
+@pytest.mark.asyncio
+async def test_export_records(
+    client: AsyncClient,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory,
+    pocket: models.DBPocket):
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    records = [
+        {
+            "user_id": user1.id,
+            "description": f"Exported record {day}",
+            "amount": 10.0 * day,
+            "currency": "THB",
+            "type": "Expense",
+            "category_id": category1.id,
+            "category_name": category1.name,
+            "pocket_id": pocket.id,
+            "record_date": f"2019-02-0{day}"
+        }
+        for day in range(5, 0, -1)
+    ]
+    response = await client.post("/records/bulk", json={"records": records}, headers=headers)
+    assert response.json()["created"] == 5
+
+    params = {"start_date": "2019-01-01", "end_date": "2020-01-01", "pocket_id": pocket.id}
+
+    response = await client.get("/records/export", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("user_id,description,amount")
+    assert len(lines) == 6
+    assert "Exported record 1" in lines[1]
+
+    # oldest first
+    response = await client.get(
+        "/records/export", params=dict(params, format="ndjson"), headers=headers
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["description"] for row in rows] == [f"Exported record {day}" for day in range(1, 6)]
+
+    response = await client.get("/records/export", params={"format": "xml"}, headers=headers)
+    assert response.status_code == 422
+
+# Test Bulk Create Records
+@pytest.mark.asyncio
+async def test_create_records_bulk(
+    client: AsyncClient,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory):
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    records = [
+        {
+            "user_id": user1.id,
+            "description": f"Bulk record {index}",
+            "amount": 5.0,
+            "currency": "THB",
+            "type": "Expense",
+            "category_id": category1.id if index != 1 else 999,
+            "category_name": category1.name,
+            "record_date": "2018-06-01"
+        }
+        for index in range(3)
+    ]
+    response = await client.post("/records/bulk", json={"records": records}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    assert [result["status"] for result in data["results"]] == ["created", "error", "created"]
+    assert data["results"][1]["detail"] == "Category not found"
+
+    response = await client.get(f"/records/{data['results'][2]['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["description"] == "Bulk record 2"
+
+    response = await client.post("/records/bulk", json={"records": []}, headers=headers)
+    assert response.status_code == 422
+
+# Test Create Records against another user's pocket
+@pytest.mark.asyncio
+async def test_create_record_foreign_pocket(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    user2: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory):
+
+    pocket = models.DBPocket(user_id=user2.id, name="User2 Wallet", balance=100)
+    session.add(pocket)
+    await session.commit()
+    await session.refresh(pocket)
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    record_data = {
+        "user_id": user1.id,
+        "description": "Foreign pocket",
+        "amount": 50.0,
+        "currency": "THB",
+        "type": "Expense",
+        "category_id": category1.id,
+        "category_name": category1.name,
+        "pocket_id": pocket.id,
+        "record_date": "2022-01-01",
+    }
+    response = await client.post("/records", json=record_data, headers=headers)
+    assert response.status_code == 403
+
+    response = await client.post(
+        "/records", json={**record_data, "pocket_id": 987654}, headers=headers
+    )
+    assert response.status_code == 404
+
+    response = await client.post(
+        "/records/bulk",
+        json={"records": [record_data, {**record_data, "pocket_id": None}]},
+        headers=headers,
+    )
+    data = response.json()
+    assert [result["status"] for result in data["results"]] == ["error", "created"]
+    assert data["results"][0]["detail"] == "User not authorized"
+
+    # user2's pocket has no entries written by user1
+    balances = await ledger.get_balances(session, [pocket.id])
+    assert balances[pocket.id] == 100
+
+# Test Monthly Summary
+@pytest.mark.asyncio
+async def test_read_records_summary(
+    client: AsyncClient,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory):
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    for record_date, amount in [("2017-03-01", 10.0), ("2017-03-20", 15.0), ("2017-04-02", 7.5)]:
+        record_data = {
+            "user_id": user1.id,
+            "description": "Summary record",
+            "amount": amount,
+            "currency": "THB",
+            "type": "Expense",
+            "category_id": category1.id,
+            "category_name": category1.name,
+            "record_date": record_date
+        }
+        response = await client.post("/records", json=record_data, headers=headers)
+        assert response.status_code == 200
+
+    response = await client.get(
+        "/records/summary",
+        params={"start_date": "2017-01-01", "end_date": "2018-01-01"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [(item["month"], item["total"], item["count"]) for item in items] == [
+        ("2017-03", 25.0, 2),
+        ("2017-04", 7.5, 1),
+    ]
+    assert items[0]["category_id"] == category1.id
+    assert items[0]["type"] == "Expense"
+
+# Test Summary rollups follow updates, deletes and rebuilds
+@pytest.mark.asyncio
+async def test_records_summary_rollups(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    token_user1: models.Token,
+    category1: models.DBCategory):
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    record_data = {
+        "user_id": user1.id,
+        "description": "Rollup record",
+        "amount": 40.0,
+        "currency": "THB",
+        "type": "Expense",
+        "category_id": category1.id,
+        "category_name": category1.name,
+        "record_date": "2016-05-10"
+    }
+    ids = []
+    for _ in range(2):
+        response = await client.post("/records", json=record_data, headers=headers)
+        ids.append(response.json()["id"])
+
+    response = await client.put(f"/records/{ids[0]}", json=dict(record_data, amount=60.0), headers=headers)
+    assert response.status_code == 200
+    response = await client.delete(f"/records/{ids[1]}", headers=headers)
+    assert response.status_code == 200
+
+    async def summary(start_date):
+        response = await client.get(
+            "/records/summary",
+            params={"start_date": start_date, "end_date": "2016-06-01"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        return [(item["month"], item["total"], item["count"]) for item in response.json()["items"]]
+
+    # month-aligned range reads the rollups, the other one groups records
+    assert await summary("2016-05-01") == [("2016-05", 60.0, 1)]
+    assert await summary("2016-05-01T00:00:01") == [("2016-05", 60.0, 1)]
+
+    await rollups.rebuild(session, user_id=user1.id)
+    assert await summary("2016-05-01") == [("2016-05", 60.0, 1)]
@@ -0,0 +1,113 @@
+from httpx import AsyncClient
+import pytest
+import pytest_asyncio
+
+from snoutsaver import models, caches
+
+
+@pytest_asyncio.fixture(name="salary")
+async def salary_category(session: models.AsyncSession) -> models.DBCategory:
+    query = await session.exec(
+        models.select(models.DBCategory).where(models.DBCategory.name == "Salary").limit(1)
+    )
+    category = query.one_or_none()
+    if category:
+        return category
+
+    category = models.DBCategory(name="Salary", type="Income", icon="business_center_rounded")
+    session.add(category)
+    await session.commit()
+    await session.refresh(category)
+    return category
+
+# Create and Update Setup write all expenses with a fixed number of queries
+@pytest.mark.asyncio
+async def test_setup_batched_writes(
+    client: AsyncClient,
+    token_user1: models.Token,
+    category1: models.DBCategory,
+    category2: models.DBCategory,
+    salary: models.DBCategory,
+    query_budget,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    caches.category_cache.clear()
+    await client.get("/users/me", headers=headers)
+
+    payload = {
+        "monthly_income": 30000,
+        "saving_goal": 5000,
+        "year": 2024,
+        "monthly_expenses": [
+            {"category_id": (category1.id, category2.id)[index % 2], "amount": 100 + index}
+            for index in range(20)
+        ],
+    }
+    with query_budget(8):
+        response = await client.post("/setups", json=payload, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    expenses = data["monthly_expenses"]
+    assert len(expenses) == 20
+    assert all(expense["id"] for expense in expenses)
+    assert expenses[1]["category_name"] == category2.name
+
+    response = await client.post("/setups", json=payload, headers=headers)
+    assert response.status_code == 400
+
+    update = {
+        "monthly_income": 35000,
+        "monthly_expenses": [
+            {"id": expenses[0]["id"], "category_id": category1.id, "amount": 500, "description": "Rent"},
+            {"category_id": category2.id, "amount": 250},
+        ],
+    }
+    with query_budget(8):
+        response = await client.put("/setups", json=update, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["monthly_income"] == 35000
+    assert [expense["amount"] for expense in data["monthly_expenses"]] == [500, 250]
+    assert data["monthly_expenses"][0]["description"] == "Rent"
+
+    response = await client.get("/setups", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(expense["amount"] for expense in data["monthly_expenses"]) == [250, 500]
+
+    response = await client.put(
+        "/setups", json={"monthly_expenses": [{"category_id": 987654, "amount": 1}]}, headers=headers
+    )
+    assert response.status_code == 404
+
+    response = await client.get("/records/summary", headers=headers)
+    assert response.status_code == 200
+    totals = {
+        (item["type"], item["category_id"]): item["total"]
+        for item in response.json()["items"]
+    }
+    assert totals[("Income", salary.id)] == 35000
+
+# The setup ETag changes with every write to the setup or its records
+@pytest.mark.asyncio
+async def test_setup_etag(
+    client: AsyncClient, token_user1: models.Token, query_budget
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await client.get("/users/me", headers=headers)
+
+    response = await client.get("/setups", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    expense_id = response.json()["monthly_expenses"][0]["id"]
+
+    with query_budget(1):
+        response = await client.get("/setups", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.delete(f"/records/{expense_id}", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get("/setups", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,171 @@
+import asyncio
+
+from httpx import AsyncClient
+import pytest
+
+from snoutsaver import models, caches, hashing, responses
+
+# Authenticated Get Current User
+@pytest.mark.asyncio
+async def test_get_user_me(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    response = await client.get("/users/me", headers=headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["id"] == user1.id
+    assert data["username"] == user1.username
+
+# Repeated requests are authenticated from the cache
+@pytest.mark.asyncio
+async def test_auth_cache_hit(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await client.get("/users/me", headers=headers)
+
+    token_hits = caches.token_cache.hits
+    user_hits = caches.user_cache.hits
+    response = await client.get("/users/me", headers=headers)
+
+    assert response.status_code == 200
+    assert caches.token_cache.hits == token_hits + 1
+    assert caches.user_cache.hits == user_hits + 1
+
+# Update User invalidates the cached snapshot
+@pytest.mark.asyncio
+async def test_update_user_invalidates_cache(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await client.get("/users/me", headers=headers)
+
+    payload = {
+        "email": user1.email,
+        "username": user1.username,
+        "first_name": "Cached",
+        "last_name": "Name",
+        "profile_picture": "www.example.com/profile_picture.png"
+    }
+    response = await client.put(f"/users/{user1.id}/update", json=payload, headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Cached"
+
+# Expired entries are not served
+def test_ttl_cache_expiry_and_lru():
+    cache = caches.TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+
+# Password hashing runs in the worker pool
+@pytest.mark.asyncio
+async def test_password_hasher_pool():
+    hasher = hashing.PasswordHasher(workers=2, max_concurrency=1)
+    hashed = await hasher.hash("12345678")
+
+    results = await asyncio.gather(
+        hasher.verify("12345678", hashed),
+        hasher.verify("wrong password", hashed),
+    )
+    assert results == [True, False]
+
+    stats = hasher.stats()
+    assert stats["count"] == 3
+    assert stats["waiting"] == 0
+    assert stats["running"] == 0
+    assert stats["hash_seconds"] > 0
+    hasher.shutdown()
+
+# Get All Users is paginated
+@pytest.mark.asyncio
+async def test_get_all_users_paginated(
+    client: AsyncClient, user1: models.DBUser
+):
+    response = await client.get("/users/", params={"page": 1, "size_per_page": 1})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 1
+    assert data["page"] == 1
+    assert data["size_per_page"] == 1
+    assert data["total"] >= 1
+    assert data["page_size"] == data["total"]
+
+    response = await client.get("/users/", params={"page": data["total"] + 1, "size_per_page": 1})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    response = await client.get("/users/", params={"page": 0})
+    assert response.status_code == 422
+
+# Get All Users returns every field of a user
+@pytest.mark.asyncio
+async def test_get_all_users_fields(
+    client: AsyncClient, session: models.AsyncSession, user1: models.DBUser
+):
+    response = await client.get("/users/", params={"size_per_page": 500})
+    assert response.status_code == 200
+    item = next(item for item in response.json()["items"] if item["id"] == user1.id)
+
+    db_user = await session.get(models.DBUser, user1.id, populate_existing=True)
+    assert set(item) == set(models.GetUser.model_fields)
+    assert item == models.GetUser.model_validate(db_user).model_dump(mode="json")
+
+# Create User checks username and email in one query
+@pytest.mark.asyncio
+async def test_create_user_query_budget(
+    client: AsyncClient, user1: models.DBUser, token_user1: models.Token, query_budget
+):
+    payload = {
+        "email": "budget@test.com",
+        "username": "budget",
+        "password": "12345678",
+        "confirm_password": "12345678",
+        "provider": "default",
+    }
+    with query_budget(3):
+        response = await client.post("/users/create", json=payload)
+    assert response.status_code == 200
+
+    with query_budget(1):
+        response = await client.post("/users/create", json={**payload, "email": "other@test.com"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already exists"
+
+    response = await client.post("/users/create", json={**payload, "username": "other"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already exists"
+
+    # authenticated from the caches without touching the database
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await client.get("/users/me", headers=headers)
+    with query_budget(0):
+        response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+
+# The fast response path returns the same body as FastAPI's own
+@pytest.mark.asyncio
+async def test_fast_json_response(
+    client: AsyncClient, user1: models.DBUser, monkeypatch
+):
+    fast = await client.get("/users/", params={"size_per_page": 5})
+    assert fast.headers["content-type"] == "application/json"
+
+    monkeypatch.setattr(responses.settings, "FAST_JSON_RESPONSE", False)
+    slow = await client.get("/users/", params={"size_per_page": 5})
+
+    assert fast.status_code == slow.status_code == 200
+    assert fast.json() == slow.json()